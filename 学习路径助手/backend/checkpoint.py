@@ -0,0 +1,91 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class CheckpointStore:
+    """生成流程的断点存储（本地SQLite）
+
+    一次生成（按请求参数区分）的技能树和各模块已生成的资源/练习题逐项写入检查点，
+    生成失败后用相同参数重试时直接复用已完成的部分；结果入库后清除检查点，超过ttl_seconds的检查点自动清理。
+    """
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._counters = {"saved": 0, "resumed": 0, "cleared": 0, "expired": 0}
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS GENERATION_CHECKPOINT (
+            gen_key TEXT NOT NULL,
+            part TEXT NOT NULL,
+            content TEXT NOT NULL,
+            update_time REAL NOT NULL,
+            PRIMARY KEY (gen_key, part)
+        )
+        ''')
+        self._conn.commit()
+
+    def open(self, gen_key):
+        """读取一次生成的检查点，返回Checkpoint"""
+        with self._lock:
+            expired = self._conn.execute(
+                'DELETE FROM GENERATION_CHECKPOINT WHERE update_time < ?', (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._conn.commit()
+            self._counters["expired"] += expired
+            rows = self._conn.execute(
+                'SELECT part, content FROM GENERATION_CHECKPOINT WHERE gen_key = ?', (gen_key,)
+            ).fetchall()
+        return Checkpoint(self, gen_key, {part: json.loads(content) for part, content in rows})
+
+    def save(self, gen_key, part, value):
+        with self._lock:
+            self._conn.execute('''
+            INSERT OR REPLACE INTO GENERATION_CHECKPOINT (gen_key, part, content, update_time)
+            VALUES (?, ?, ?, ?)
+            ''', (gen_key, part, json.dumps(value, ensure_ascii=False), time.time()))
+            self._conn.commit()
+            self._counters["saved"] += 1
+
+    def clear(self, gen_key):
+        with self._lock:
+            self._conn.execute('DELETE FROM GENERATION_CHECKPOINT WHERE gen_key = ?', (gen_key,))
+            self._conn.commit()
+            self._counters["cleared"] += 1
+
+    def mark_resumed(self):
+        with self._lock:
+            self._counters["resumed"] += 1
+
+    def stats(self):
+        with self._lock:
+            pending = self._conn.execute('SELECT COUNT(DISTINCT gen_key) FROM GENERATION_CHECKPOINT').fetchone()[0]
+            counters = dict(self._counters)
+        return {**counters, "pending": pending, "ttl_seconds": self.ttl_seconds}
+
+
+class Checkpoint:
+    """单次生成的检查点，part为path、resources:模块名或exercises:模块名"""
+
+    def __init__(self, store, gen_key, parts):
+        self.store = store
+        self.gen_key = gen_key
+        self.parts = parts
+        if parts:
+            store.mark_resumed()
+
+    def get(self, part):
+        return self.parts.get(part)
+
+    def save(self, part, value):
+        self.parts[part] = value
+        self.store.save(self.gen_key, part, value)
+
+    def clear(self):
+        self.parts = {}
+        self.store.clear(self.gen_key)
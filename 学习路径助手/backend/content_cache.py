@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+
+class ContentCache:
+    """进程内LRU读穿缓存：接口查询结果按key缓存，超过max_entries时淘汰最久未访问的条目
+
+    key为元组，第二项为内容所属的对象（如("catalog", catalog_id)），内容重新生成后用invalidate(owner)
+    清除该对象的全部条目。只在事件循环所在线程中使用，不加锁。
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        """返回缓存内容，不存在返回None"""
+        value = self._entries.get(key)
+        if value is None:
+            self._counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def invalidate(self, *owners):
+        """清除属于这些对象的全部条目"""
+        owners = set(owners)
+        stale = [key for key in self._entries if len(key) > 1 and key[1] in owners]
+        for key in stale:
+            del self._entries[key]
+        self._counters["invalidations"] += len(stale)
+
+    def stats(self):
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,243 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from metrics import DB_POOL_CHECKOUT, DB_POOL_CONNECTIONS, DB_POOL_EVENTS, DB_POOL_WAITING
+
+
+class PoolTimeoutError(Exception):
+    """等待超时仍未获取到数据库连接"""
+
+
+class PooledConnection:
+    """连接池中的连接：属性透传给底层连接，close()把连接归还连接池而不是真正关闭"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def close(self):
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    """有界数据库连接池
+
+    最多保持max_size个连接，连接用完时等待wait_timeout秒后抛出PoolTimeoutError。
+    取出时空闲超过ping_after_seconds的连接先执行health_check_sql检查可用性；
+    空闲超过max_idle_seconds或创建超过max_lifetime_seconds的连接被关闭重建。
+    归还时回滚未提交的事务，回滚失败的连接直接丢弃。
+    协程通过await run(operation)使用连接：数据库驱动的阻塞调用在连接池专用的max_size个线程中执行。
+    """
+
+    def __init__(self, connect, max_size=10, wait_timeout=10, max_idle_seconds=300, max_lifetime_seconds=1800,
+                 ping_after_seconds=5, health_check_sql="SELECT 1"):
+        self.connect = connect
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.ping_after_seconds = ping_after_seconds
+        self.health_check_sql = health_check_sql
+        self._cond = threading.Condition()
+        self._idle = deque()  # 最近归还的在右端，优先复用
+        self._size = 0  # 已打开的连接数（含正在创建的）
+        self._waiting = 0
+        self._counters = {"checkouts": 0, "created": 0, "timeouts": 0, "closed_idle": 0, "closed_lifetime": 0,
+                          "closed_broken": 0}
+        # 每个线程同一时刻最多占用一个连接，线程数与连接数相同，协程在队列中等待而不是占用线程
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db-pool")
+        self._update_gauges()
+
+    def acquire(self, start=None):
+        """取出一个连接；start为开始等待的时间（perf_counter），默认为调用时刻"""
+        start = start or time.perf_counter()
+        deadline = start + self.wait_timeout
+        while True:
+            conn = None
+            with self._cond:
+                stale = self._pop_stale_locked()
+                while True:
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise self._timeout_locked()
+                    self._waiting += 1
+                    self._update_gauges()
+                    self._cond.wait(remaining)
+                    self._waiting -= 1
+
+            for stale_conn in stale:
+                self._close_raw(stale_conn)
+            if conn is None:
+                conn = self._create()
+            elif not self._check(conn):
+                continue
+
+            conn.checked_out = True
+            with self._cond:
+                self._counters["checkouts"] += 1
+                self._update_gauges()
+            DB_POOL_CHECKOUT.observe(time.perf_counter() - start)
+            return conn
+
+    def release(self, conn):
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        try:
+            conn.raw.rollback()
+        except Exception:
+            self._discard(conn, "closed_broken")
+            return
+        if self._expired(conn):
+            self._discard(conn, "closed_lifetime")
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._update_gauges()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, start=None):
+        """with块内独占一个连接，退出时归还（未提交的事务被回滚）"""
+        conn = self.acquire(start)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    async def run(self, operation):
+        """在连接池线程中借用一个连接执行operation(conn)并返回其结果，连接随后归还
+
+        排队等待线程的时间计入wait_timeout，超时抛出PoolTimeoutError
+        """
+        start = time.perf_counter()
+        queued = [True]
+        with self._cond:
+            self._waiting += 1
+            self._update_gauges()
+
+        def dequeue_locked():
+            # 线程开始执行和协程被取消都会出队，只计一次
+            if queued[0]:
+                queued[0] = False
+                self._waiting -= 1
+                self._update_gauges()
+
+        def run_with_connection():
+            with self._cond:
+                dequeue_locked()
+                if time.perf_counter() - start > self.wait_timeout:
+                    raise self._timeout_locked()
+            with self.connection(start) as conn:
+                return operation(conn)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run_with_connection)
+        finally:
+            with self._cond:
+                dequeue_locked()
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "max_size": self.max_size
+            }
+
+    def _timeout_locked(self):
+        self._counters["timeouts"] += 1
+        DB_POOL_EVENTS.inc(event="timeout")
+        return PoolTimeoutError(f"等待{self.wait_timeout}秒仍未获取到数据库连接（连接池上限{self.max_size}）")
+
+    def _create(self):
+        try:
+            conn = PooledConnection(self, self.connect())
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._update_gauges()
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._counters["created"] += 1
+        DB_POOL_EVENTS.inc(event="created")
+        return conn
+
+    def _expired(self, conn):
+        return time.monotonic() - conn.created_at > self.max_lifetime_seconds
+
+    def _check(self, conn):
+        """取出空闲连接时检查是否过期/可用，不可用时关闭并返回False"""
+        now = time.monotonic()
+        if self._expired(conn):
+            self._discard(conn, "closed_lifetime")
+            return False
+        idle = now - conn.last_used
+        if idle > self.max_idle_seconds:
+            self._discard(conn, "closed_idle")
+            return False
+        if idle > self.ping_after_seconds:
+            try:
+                cursor = conn.raw.cursor()
+                cursor.execute(self.health_check_sql)
+                cursor.fetchall()
+                cursor.close()
+            except Exception:
+                self._discard(conn, "closed_broken")
+                return False
+        return True
+
+    def _pop_stale_locked(self):
+        """移出最久未用端空闲超时的连接（LIFO复用下它们不会再被取到），由调用方在锁外关闭"""
+        stale = []
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].last_used > self.max_idle_seconds:
+            stale.append(self._idle.popleft())
+        if stale:
+            self._size -= len(stale)
+            self._counters["closed_idle"] += len(stale)
+            DB_POOL_EVENTS.inc(len(stale), event="closed_idle")
+            self._update_gauges()
+        return stale
+
+    @staticmethod
+    def _close_raw(conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    def _discard(self, conn, reason):
+        with self._cond:
+            self._size -= 1
+            self._counters[reason] += 1
+            self._update_gauges()
+            self._cond.notify()
+        DB_POOL_EVENTS.inc(event=reason)
+        self._close_raw(conn)
+
+    def _update_gauges(self):
+        DB_POOL_CONNECTIONS.set(len(self._idle), state="idle")
+        DB_POOL_CONNECTIONS.set(self._size - len(self._idle), state="in_use")
+        DB_POOL_WAITING.set(self._waiting)
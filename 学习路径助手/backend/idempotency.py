@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import json
+import time
+
+
+class IdempotencyKeyMismatch(Exception):
+    """同一个Idempotency-Key被用于参数不同的请求"""
+
+
+class IdempotencyInProgress(Exception):
+    """相同Idempotency-Key的请求仍在处理中，等待超时"""
+
+
+class IdempotencyStore:
+    """基于数据库IDEMPOTENCY_KEY表的幂等请求记录
+
+    首次请求登记为processing并执行，完成后保存完整响应；相同key的重试直接返回保存的响应，
+    原请求仍在执行时等待其完成。执行失败或processing记录长时间未更新（进程崩溃）时允许重试接管。
+    数据库读写通过run(operation)执行（operation(conn)在连接池线程中执行，接口中为run_db，连接池繁忙时返回503）。
+    """
+
+    def __init__(self, run, repository, wait_seconds=300, stale_seconds=900, poll_interval=1.0):
+        self.run_db = run
+        self.repository = repository
+        self.wait_seconds = wait_seconds
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def request_hash(payload):
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def run(self, scope, key, payload, fn):
+        """执行协程函数fn并返回(response, replayed)；key为空时直接执行"""
+        if not key:
+            return await fn(), False
+
+        request_hash = self.request_hash(payload)
+        deadline = time.time() + self.wait_seconds
+        while not await self._claim(scope, key, request_hash):
+            record = await self._load(scope, key)
+            if record is None:
+                continue
+            stored_hash, status, response_body = record
+            if stored_hash != request_hash:
+                raise IdempotencyKeyMismatch(f"Idempotency-Key已用于参数不同的请求：{key}")
+            if status == "completed":
+                return json.loads(response_body), True
+            if time.time() > deadline:
+                raise IdempotencyInProgress(f"相同Idempotency-Key的请求仍在处理中：{key}")
+            await asyncio.sleep(self.poll_interval)
+
+        try:
+            response = await fn()
+        except Exception:
+            try:
+                await self._finish(scope, key, "failed", None)
+            except Exception as e:
+                # 标记失败本身失败（如连接池繁忙）时返回原始错误，processing记录超过stale_seconds后由重试接管
+                print(f"幂等记录标记失败未成功（{scope}:{key}）：{str(e)}")
+            raise
+        await self._finish(scope, key, "completed", json.dumps(response, ensure_ascii=False))
+        return response, False
+
+    async def _claim(self, scope, key, request_hash):
+        """登记或接管该key，成功返回True"""
+        return await self._execute(lambda cursor: self.repository.claim_idempotency_key(
+            cursor, scope, key, request_hash, self.stale_seconds
+        ), commit=True)
+
+    async def _load(self, scope, key):
+        return await self._execute(lambda cursor: self.repository.load_idempotency_key(cursor, scope, key))
+
+    async def _finish(self, scope, key, status, response_body):
+        await self._execute(lambda cursor: self.repository.finish_idempotency_key(
+            cursor, scope, key, status, response_body
+        ), commit=True)
+
+    async def _execute(self, operation, commit=False):
+        def run(conn):
+            cursor = conn.cursor()
+            try:
+                result = operation(cursor)
+                if commit:
+                    conn.commit()
+                return result
+            finally:
+                cursor.close()
+
+        return await self.run_db(run)
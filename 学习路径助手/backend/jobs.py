@@ -0,0 +1,237 @@
+import asyncio
+import itertools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# 优先级通道：数值越小越先执行，交互式请求不会排在批量预生成之后
+PRIORITY_LANES = {
+    "interactive": 0,
+    "bulk": 1
+}
+
+
+class QueueFullError(Exception):
+    """任务队列已满，retry_after为建议的重试等待秒数"""
+
+    def __init__(self, lane, retry_after):
+        super().__init__(f"{lane}队列已满")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Job:
+    """一次后台生成任务的状态记录"""
+
+    def __init__(self, payload, lane):
+        self.job_id = uuid.uuid4().hex
+        self.payload = payload
+        self.lane = lane
+        self.status = "queued"  # queued / running / succeeded / failed
+        self.stage = "排队中"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.create_time = time.time()
+        self.start_time = None
+        self.finish_time = None
+        # 每次状态变化加1，写入JobStore时丢弃乱序到达的旧状态
+        self.version = 0
+
+    @classmethod
+    def from_record(cls, record):
+        """由JobStore中的记录还原任务状态（不含payload），供其他worker进程查询"""
+        job = cls(None, record["lane"])
+        for field, value in record.items():
+            setattr(job, field, value)
+        return job
+
+    def to_record(self):
+        return {
+            "job_id": self.job_id,
+            "lane": self.lane,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "create_time": self.create_time,
+            "start_time": self.start_time,
+            "finish_time": self.finish_time,
+            "version": self.version
+        }
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "lane": self.lane,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "create_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.create_time)),
+            "elapsed_seconds": round((self.finish_time or time.time()) - (self.start_time or self.create_time), 2)
+        }
+
+
+class JobStore:
+    """任务状态的共享存储（本地SQLite），同一台机器上的多个uvicorn进程都能查询任意进程接收的任务
+
+    任务只在接收它的进程中执行，状态、进度和结果每次变化都写入这里；完成超过result_ttl秒的任务自动清理。
+    """
+
+    def __init__(self, path, result_ttl):
+        self.path = path
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS GENERATION_JOB (
+            job_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            record TEXT NOT NULL,
+            update_time REAL NOT NULL
+        )
+        ''')
+        self._conn.commit()
+
+    def save(self, record):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+            INSERT INTO GENERATION_JOB (job_id, version, record, update_time) VALUES (?, ?, ?, ?)
+            ON CONFLICT (job_id) DO UPDATE SET
+                version = excluded.version, record = excluded.record, update_time = excluded.update_time
+            WHERE excluded.version > GENERATION_JOB.version
+            ''', (record["job_id"], record["version"], json.dumps(record, ensure_ascii=False), now))
+            self._conn.execute('DELETE FROM GENERATION_JOB WHERE update_time < ?', (now - self.result_ttl,))
+            self._conn.commit()
+
+    def load(self, job_id):
+        """返回任务记录，不存在或已过期返回None"""
+        with self._lock:
+            row = self._conn.execute('SELECT record FROM GENERATION_JOB WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class JobManager:
+    """有界后台任务池：按优先级通道排队，每个通道独立限制排队数量
+
+    工作者是事件循环中的协程，在start()时创建；所有方法都在事件循环所在线程调用。
+    排队和执行只在本进程内，任务状态同时写入store，其他worker进程收到的查询从store读取。
+    """
+
+    def __init__(self, handler, workers, lane_limits, store, result_ttl=3600):
+        # handler(payload, report) 为协程函数，执行任务并返回结果，report(stage, **progress) 用于上报进度
+        self.handler = handler
+        self.workers = workers
+        self.lane_limits = lane_limits
+        self.store = store
+        self.result_ttl = result_ttl
+        self._saves = set()
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._queued = {lane: 0 for lane in PRIORITY_LANES}
+        self._tasks = []
+        # 最近完成任务的平均耗时，用于估算Retry-After
+        self._avg_duration = 60.0
+
+    def start(self):
+        """在当前事件循环中启动工作者协程"""
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*self._saves, return_exceptions=True)
+
+    async def submit(self, payload, lane="interactive"):
+        if lane not in PRIORITY_LANES:
+            raise ValueError(f"未知的优先级通道：{lane}")
+
+        self._evict_finished()
+        if self._queued[lane] >= self.lane_limits[lane]:
+            raise QueueFullError(lane, self._estimate_retry_after(lane))
+        job = Job(payload, lane)
+        self._jobs[job.job_id] = job
+        self._queued[lane] += 1
+
+        self._queue.put_nowait((PRIORITY_LANES[lane], next(self._seq), job))
+        # 返回job_id前写入store，随后发到其他进程的查询也能找到该任务
+        await self._save(job)
+        return job
+
+    async def get(self, job_id):
+        """本进程接收的任务直接返回，否则从store读取；不存在或已过期返回None"""
+        job = self._jobs.get(job_id)
+        if job:
+            return job
+        record = await asyncio.to_thread(self.store.load, job_id)
+        return Job.from_record(record) if record else None
+
+    def _save(self, job):
+        """把任务当前状态写入store（在线程中执行），返回可等待的写入任务"""
+        job.version += 1
+        task = asyncio.create_task(asyncio.to_thread(self.store.save, job.to_record()))
+        self._saves.add(task)
+        task.add_done_callback(self._saves.discard)
+        return task
+
+    def stats(self):
+        running = sum(1 for job in self._jobs.values() if job.status == "running")
+        return {
+            "workers": self.workers,
+            "running": running,
+            "queued": dict(self._queued),
+            "lane_limits": dict(self.lane_limits)
+        }
+
+    def _estimate_retry_after(self, lane):
+        # 排在该通道前面的任务数 / 工作线程数 * 平均耗时
+        ahead = sum(count for name, count in self._queued.items() if PRIORITY_LANES[name] <= PRIORITY_LANES[lane])
+        return max(1, int(ahead / self.workers * self._avg_duration))
+
+    def _evict_finished(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finish_time and now - job.finish_time > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            self._queued[job.lane] -= 1
+            job.status = "running"
+            job.stage = "开始生成"
+            job.start_time = time.time()
+            self._save(job)
+
+            def report(stage, **progress):
+                job.stage = stage
+                job.progress.update(progress)
+                self._save(job)
+
+            try:
+                job.result = await self.handler(job.payload, report)
+                job.status = "succeeded"
+                job.stage = "生成完成"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                job.stage = "生成失败"
+            finally:
+                job.finish_time = time.time()
+                self._avg_duration = self._avg_duration * 0.8 + (job.finish_time - job.start_time) * 0.2
+                self._queue.task_done()
+            try:
+                await self._save(job)
+            except Exception as e:
+                print(f"保存任务{job.job_id}状态失败：{str(e)}")
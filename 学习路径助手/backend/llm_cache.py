@@ -0,0 +1,95 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """基于本地SQLite的LLM响应缓存
+
+    key为(模型, 温度, 规范化后的prompt)的哈希；支持TTL过期、按最近访问时间的容量淘汰（LRU）
+    和命中/未命中计数。使用WAL模式，同一台机器上的多个uvicorn进程可共享同一个缓存文件。
+    """
+
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS LLM_CACHE (
+            cache_key TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            create_time REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS IX_LLM_CACHE_LAST_ACCESS ON LLM_CACHE (last_access)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, temperature, prompt):
+        # 连续空白折叠为一个空格，避免缩进/换行差异导致缓存失效
+        normalized = " ".join(prompt.split())
+        raw = json.dumps([model, round(float(temperature), 3), normalized], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """返回缓存内容，不存在或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content, create_time FROM LLM_CACHE WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute('DELETE FROM LLM_CACHE WHERE cache_key = ?', (key,))
+                self._conn.commit()
+                self._counters["expired"] += 1
+                row = None
+
+            if not row:
+                self._counters["misses"] += 1
+                return None
+
+            self._conn.execute('UPDATE LLM_CACHE SET last_access = ? WHERE cache_key = ?', (now, key))
+            self._conn.commit()
+            self._counters["hits"] += 1
+            return row[0]
+
+    def set(self, key, content):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+            INSERT OR REPLACE INTO LLM_CACHE (cache_key, content, create_time, last_access)
+            VALUES (?, ?, ?, ?)
+            ''', (key, content, now, now))
+            self._counters["writes"] += 1
+
+            # 超出容量时淘汰最久未访问的条目
+            overflow = self._conn.execute('SELECT COUNT(*) FROM LLM_CACHE').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute('''
+                DELETE FROM LLM_CACHE WHERE cache_key IN (
+                    SELECT cache_key FROM LLM_CACHE ORDER BY last_access LIMIT ?
+                )
+                ''', (overflow,))
+                self._counters["evictions"] += overflow
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM LLM_CACHE').fetchone()[0]
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+
+from openai import AsyncOpenAI
+
+
+class LLMProvider:
+    """LLM调用接口（协程）：await complete()返回完整文本，async for遍历stream()逐段得到文本增量
+
+    传入usage字典时，调用结束后写入本次的prompt_tokens/completion_tokens（接口未返回用量时不写入）。
+    """
+
+    model = None
+
+    async def complete(self, prompt, temperature, usage=None):
+        raise NotImplementedError
+
+    async def stream(self, prompt, temperature, usage=None):
+        raise NotImplementedError
+
+
+def _fill_usage(usage, response_usage):
+    if usage is not None and response_usage is not None:
+        usage["prompt_tokens"] = response_usage.prompt_tokens
+        usage["completion_tokens"] = response_usage.completion_tokens
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """OpenAI兼容接口（DeepSeek、bench/mock_llm_server.py等）"""
+
+    def __init__(self, api_key, base_url, model):
+        self.model = model
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+
+    async def complete(self, prompt, temperature, usage=None):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature
+        )
+        if not response.choices or not response.choices[0].message.content:
+            raise Exception("DeepSeek返回内容为空")
+        _fill_usage(usage, response.usage)
+        return response.choices[0].message.content
+
+    async def stream(self, prompt, temperature, usage=None):
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+            # 最后一个分块携带本次调用的token用量
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        async for chunk in stream:
+            _fill_usage(usage, getattr(chunk, "usage", None))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+# 按prompt内容识别请求类型：技能树、学习资源、练习题
+def prompt_kind(prompt):
+    if "学习资源推荐专家" in prompt:
+        return "resources"
+    if "练习题生成专家" in prompt:
+        return "exercises"
+    return "path"
+
+
+class MockLLMProvider(LLMProvider):
+    """离线模拟LLM：回放录制的响应或生成格式合法的合成响应，可配置延迟和错误率
+
+    recordings为{"path"|"resources"|"exercises": [响应文本, ...]}，同类请求轮流回放；
+    没有录制内容的类型按prompt中的目标/模块名生成合成响应。
+    """
+
+    model = "mock-chat"
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, recordings=None, chunk_size=16, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.recordings = recordings or {}
+        self.chunk_size = chunk_size
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._replay_index = {}
+
+    @classmethod
+    def from_env(cls):
+        recordings = None
+        recordings_path = os.getenv("MOCK_LLM_RECORDINGS")
+        if recordings_path:
+            with open(recordings_path, encoding="utf-8") as f:
+                recordings = json.load(f)
+        return cls(
+            latency_ms=float(os.getenv("MOCK_LLM_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("MOCK_LLM_JITTER_MS", "0")),
+            error_rate=float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+            recordings=recordings
+        )
+
+    async def complete(self, prompt, temperature, usage=None):
+        await self._simulate_call()
+        content = self.respond(prompt)
+        if usage is not None:
+            usage.update(self.usage(prompt, content))
+        return content
+
+    async def stream(self, prompt, temperature, usage=None):
+        await self._simulate_call()
+        content = self.respond(prompt)
+        for start in range(0, len(content), self.chunk_size):
+            yield content[start:start + self.chunk_size]
+        if usage is not None:
+            usage.update(self.usage(prompt, content))
+
+    @staticmethod
+    def usage(prompt, content):
+        """模拟的token用量：按字符数计"""
+        return {"prompt_tokens": len(prompt), "completion_tokens": len(content)}
+
+    def sample_latency(self):
+        """本次调用的模拟延迟（秒）"""
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    async def _simulate_call(self):
+        await asyncio.sleep(self.sample_latency())
+        if self.should_fail():
+            raise Exception("模拟LLM调用失败")
+
+    def respond(self, prompt):
+        kind = prompt_kind(prompt)
+        replay = self.recordings.get(kind)
+        if replay:
+            with self._lock:
+                index = self._replay_index.get(kind, 0)
+                self._replay_index[kind] = index + 1
+            return replay[index % len(replay)]
+
+        if kind == "resources":
+            return synthetic_resources(prompt)
+        if kind == "exercises":
+            return synthetic_exercises(prompt)
+        return synthetic_path(prompt)
+
+
+def _module_name(prompt):
+    match = re.search(r'「(.+?)」', prompt)
+    return match.group(1) if match else "模块"
+
+
+def synthetic_path(prompt):
+    match = re.search(r'核心目标：(.+)', prompt)
+    target = match.group(1).strip() if match else "学习目标"
+    parts = []
+    for emoji, level, title in (("🟢", "初级", "基础入门"), ("🟡", "中级", "进阶核心"), ("🔴", "高级", "实战拔高")):
+        parts.append(f"# {emoji} {level}（{title}）\n---\n")
+        for i in range(1, 4):
+            name = f"{target}{level}{i}"
+            dependency = "无" if level == "初级" else f"{target}{level}{i - 1}" if i > 1 else "上一层级全部模块"
+            parts.append(
+                f"## {i}. {name}\n"
+                f"- 预计学习时长：{4 + 2 * i}小时\n"
+                f"- 所属层级：{level}\n"
+                f"- 前置依赖：{dependency}\n"
+                f"- 核心技能点：{name}概念、{name}实践\n"
+                f"- 学习目标：能够独立完成{name}练习\n"
+            )
+    return "".join(parts).strip()
+
+
+def synthetic_resources(prompt):
+    name = _module_name(prompt)
+    return json.dumps([
+        {"title": f"{name}入门视频", "url": "https://www.bilibili.com/video/BV1mock000001",
+         "source": "B站", "type": "视频", "tag": "适合零基础"},
+        {"title": f"{name}官方文档", "url": "https://docs.example.com/mock",
+         "source": "官方文档", "type": "文档", "tag": "适合零基础"}
+    ], ensure_ascii=False)
+
+
+def synthetic_exercises(prompt):
+    name = _module_name(prompt)
+    exercises = [{
+        "type": "single_choice",
+        "question": f"关于{name}的第{i}题，正确的选项是？",
+        "options": ["选项A", "选项B", "选项C", "选项D"],
+        "answer": "选项A",
+        "analysis": f"{name}第{i}题解析",
+        "difficulty": 1
+    } for i in range(1, 4)]
+    exercises.append({
+        "type": "essay",
+        "question": f"简述{name}的核心概念。",
+        "answer": f"{name}的核心概念包括……",
+        "analysis": f"{name}问答题解析",
+        "difficulty": 1
+    })
+    return "```json\n" + json.dumps(exercises, ensure_ascii=False, indent=2) + "\n```"
+
+
+def create_llm_provider(model):
+    """按环境变量LLM_PROVIDER创建LLM调用实现：openai（默认，OpenAI兼容接口）或mock（进程内模拟）"""
+    provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    if provider == "mock":
+        return MockLLMProvider.from_env()
+    if provider == "openai":
+        return OpenAICompatibleProvider(
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            base_url=os.getenv("API_BASE_URL"),
+            model=model
+        )
+    raise ValueError(f"未知的LLM_PROVIDER：{provider}")
@@ -1,44 +1,146 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import pyodbc
 import os
 import re
 import json
+import asyncio
+import hashlib
+import unicodedata
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from openai import OpenAI
+from checkpoint import CheckpointStore
+from content_cache import ContentCache
+from db_pool import ConnectionPool, PoolTimeoutError
+from jobs import JobManager, JobStore, QueueFullError
+from llm_cache import LLMCache
+from llm_provider import create_llm_provider
+from repository import create_repository
+from metrics import MetricsMiddleware, record_tokens, registry, stage_timer
+from singleflight import SingleFlight
+from idempotency import IdempotencyInProgress, IdempotencyKeyMismatch, IdempotencyStore
+from skill_tree_parser import SkillTreeParser, parse_learning_modules
 
 # 加载环境变量
 load_dotenv()
-app = FastAPI(title="LearnPath 后端API")
 
-# 初始化LLM客户端
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url=os.getenv("API_BASE_URL")
+
+@asynccontextmanager
+async def lifespan(app):
+    """启动时在事件循环中启动后台生成任务的工作者协程，关闭时取消"""
+    job_manager.start()
+    yield
+    await job_manager.stop()
+
+
+app = FastAPI(title="LearnPath 后端API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+LLM_MODEL = "deepseek-chat"
+
+# 初始化LLM调用实现：默认DeepSeek（OpenAI兼容接口），LLM_PROVIDER=mock时使用离线模拟
+llm_provider = create_llm_provider(LLM_MODEL)
+
+# LLM响应缓存（本地SQLite），相同模型+温度+prompt直接复用结果
+llm_cache = LLMCache(
+    path=os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.db")),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
 )
 
+# 并发的相同生成请求/LLM调用只执行一次；协调状态与LLM缓存共用同一个本地SQLite文件，本机多个worker进程共享
+single_flight = SingleFlight(path=llm_cache.path)
+
+# 生成流程的断点：已生成的技能树和模块资源/练习题先存本地，失败重试时复用，入库成功后清除
+checkpoints = CheckpointStore(
+    path=llm_cache.path,
+    ttl_seconds=int(os.getenv("CHECKPOINT_TTL", str(24 * 3600)))
+)
+
+# 模块资源/练习题查询结果的进程内LRU缓存（按模块目录条目），内容重新生成时清除；
+# 响应带强ETag，客户端用If-None-Match重新验证，内容未变时返回304，缓存命中时不访问数据库
+content_cache = ContentCache(max_entries=int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", "2000")))
+CONTENT_CACHE_MAX_AGE = int(os.getenv("CONTENT_CACHE_MAX_AGE", "300"))
+
+# 已生成路径的解析结果（路径信息和模块列表），路径生成后不再变化，只按LRU淘汰
+path_cache = ContentCache(max_entries=int(os.getenv("PATH_CACHE_MAX_ENTRIES", "500")))
+SUMMARY_GOAL_LENGTH = 30
+
+# 模块资源/练习题并发生成的最大LLM请求数
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "6"))
+# 模块资源/练习题的生成时机：eager=生成路径时为全部模块生成；lazy=生成路径时只生成并保存技能树，
+# 模块的资源/练习题在首次查询时生成，并在后台预取路径中其后PREFETCH_MODULES个模块
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "eager").lower()
+if ENRICHMENT_MODE not in ("eager", "lazy"):
+    raise ValueError(f"未知的ENRICHMENT_MODE：{ENRICHMENT_MODE}")
+PREFETCH_MODULES = int(os.getenv("PREFETCH_MODULES", "2"))
+# 流式接口无事件时发送心跳注释的间隔（秒），避免代理断开空闲连接
+SSE_KEEPALIVE_SECONDS = 15
+
+
+# 数据访问层：SQL Server（默认）或SQLite，由DB_BACKEND决定
+repository = create_repository()
+
 
-# 数据库连接函数
 def get_db_connection():
-    """获取SQL Server数据库连接（Windows身份验证）"""
+    """新建数据库连接（SQL Server使用Windows身份验证，SQLite使用WAL模式）"""
     try:
-        conn = pyodbc.connect(
-            f"DRIVER={os.getenv('SQL_SERVER_DRIVER')};"
-            f"SERVER={os.getenv('SQL_SERVER_SERVER')};"
-            f"DATABASE={os.getenv('SQL_SERVER_DATABASE')};"
-            f"Trusted_Connection=yes;"  # Windows身份验证的关键配置
-        )
-        return conn
+        return repository.connect()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"数据库连接失败：{str(e)}")
 
 
+# 数据库连接池：复用连接，避免每个请求重新建立连接
+db_pool = ConnectionPool(
+    connect=get_db_connection,
+    max_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    wait_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    max_idle_seconds=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+    max_lifetime_seconds=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+    ping_after_seconds=float(os.getenv("DB_POOL_PING_AFTER", "5")),
+    health_check_sql=repository.health_check_sql
+)
+
+
+async def run_db(operation):
+    """接口使用数据库：在连接池线程中借用一个连接执行operation(conn)并返回其结果，结束后归还（未提交的事务被回滚）
+
+    协程等待期间不占用事件循环和接口线程池；连接池繁忙时返回503
+    """
+    try:
+        return await db_pool.run(operation)
+    except PoolTimeoutError as e:
+        raise HTTPException(status_code=503, detail=f"数据库繁忙：{str(e)}", headers={"Retry-After": "1"})
+
+
+# 幂等请求记录：带Idempotency-Key的重试直接返回首次请求保存的结果
+idempotency_store = IdempotencyStore(run=run_db, repository=repository)
+
+
+async def run_idempotent(scope, idempotency_key, request, response, handler):
+    """按Idempotency-Key执行协程函数handler()并返回其响应；重复请求回放已保存的响应"""
+    try:
+        body, replayed = await idempotency_store.run(scope, idempotency_key, request.model_dump(), handler)
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "30"})
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+
 # 数据模型定义
 class PathRequest(BaseModel):
     target: str
     level: str
     pace: str
     resource_type: str
+    bypass_cache: bool = False  # True=忽略已缓存的LLM结果重新生成（新结果仍会写入缓存）
+
+
+class GenerateJobRequest(PathRequest):
+    priority: str = "interactive"  # interactive=用户交互请求，bulk=批量预生成
 
 
 class ProgressRequest(BaseModel):
@@ -56,11 +158,27 @@ class AnswerRequest(BaseModel):
     is_correct: bool
 
 
+class AnswerItem(BaseModel):
+    exercise_id: int
+    user_answer: str
+    is_correct: bool
+
+
+class AnswerSheetRequest(BaseModel):
+    path_id: int
+    module_name: str
+    answers: list[AnswerItem]
+
+
 class AccuracyRequest(BaseModel):
     path_id: int
     module_name: str = None
 
 
+class AccuracyBreakdownRequest(BaseModel):
+    path_id: int
+
+
 # Prompt构建函数 - 分层级技能树（核心修改）
 def build_learning_path_prompt(target, level, pace, resource_type):
     """构建结构化分层级技能树Prompt"""
@@ -255,435 +373,1076 @@ def build_exercise_prompt(module_name, level):
     """.strip()
 
 
-# 解析分层级技能树模块（核心修改）
-def parse_learning_modules(path_content):
-    """解析DeepSeek返回的Markdown格式分层级技能树，提取模块信息"""
-    modules = []
-    # 匹配层级和模块
-    level_pattern = re.compile(r'#\s*[🟢🟡🔴]?\s*(初级|中级|高级).*?\n(.*?)(?=#\s*[🟢🟡🔴]|$)', re.DOTALL)
-    level_matches = level_pattern.findall(path_content)
+def is_usable(content, validate):
+    """validate(content)不抛异常时内容可用；没有validate时任何内容都可用"""
+    if validate is None:
+        return True
+    try:
+        validate(content)
+        return True
+    except Exception:
+        return False
+
+
+# 调用LLM，返回去除首尾空白的文本内容；use_cache=False时跳过缓存读取，stage为指标中的阶段名
+# validate(content)在回复不可用（如不是JSON、解析不出模块）时抛出异常：不可用的回复不写入缓存，
+# 缓存中已有的不可用内容按未命中处理
+# 本地SQLite（LLM缓存、检查点）的读写通过asyncio.to_thread执行，不阻塞事件循环
+async def call_llm(prompt, temperature, use_cache=True, stage="llm", validate=None):
+    cache_key = LLMCache.make_key(llm_provider.model, temperature, prompt)
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, cache_key)
+        if cached is not None and is_usable(cached, validate):
+            return cached
+
+    async def request_llm():
+        usage = {}
+        with stage_timer(stage):
+            content = (await llm_provider.complete(prompt, temperature, usage)).strip()
+        record_tokens(stage, usage)
+        if validate:
+            validate(content)
+        await asyncio.to_thread(llm_cache.set, cache_key, content)
+        return content
+
+    # 其他请求正在生成同一个prompt时直接等待其结果
+    return await single_flight.do(f"llm:{cache_key}", request_llm)
+
+
+# 流式调用LLM，逐段返回文本增量；命中缓存时一次性返回完整内容。validate同call_llm，完整内容可用时才写入缓存
+async def stream_llm(prompt, temperature, use_cache=True, stage="llm", validate=None):
+    cache_key = LLMCache.make_key(llm_provider.model, temperature, prompt)
+    if use_cache:
+        cached = await asyncio.to_thread(llm_cache.get, cache_key)
+        if cached is not None and is_usable(cached, validate):
+            yield cached
+            return
+
+    chunks = []
+    usage = {}
+    with stage_timer(stage):
+        async for delta in llm_provider.stream(prompt, temperature, usage):
+            chunks.append(delta)
+            yield delta
+    record_tokens(stage, usage)
+
+    content = "".join(chunks).strip()
+    if content and is_usable(content, validate):
+        await asyncio.to_thread(llm_cache.set, cache_key, content)
+
+
+def parse_json_content(content):
+    """去掉LLM可能包裹的```json代码块标记后解析JSON"""
+    content = re.sub(r'^```json|```$', '', content).strip()
+    return json.loads(content)
+
+
+def parse_resources(content):
+    """把LLM返回的资源JSON转换为可直接入库的资源列表，格式不对时抛出异常"""
+    resources = parse_json_content(content)
+    return [{
+        "title": res.get("title", ""),
+        "url": res.get("url", ""),
+        "source": res.get("source", ""),
+        "tag": res.get("tag", ""),
+        "type": res.get("type", "")
+    } for res in resources]
+
+
+def parse_exercises(content):
+    """把LLM返回的练习题JSON转换为可直接入库的练习题列表，格式不对时抛出异常"""
+    exercises = parse_json_content(content)
+    rows = []
+    for ex in exercises:
+        if ex.get("type") == "single_choice":
+            question = f"{ex['question']}\n选项：{', '.join(ex['options'])}"
+            # 额外存储options用于前端展示
+            options = ','.join(ex['options'])
+        else:
+            question = ex["question"]
+            options = ""
+        rows.append({
+            "question": question,
+            "answer": ex["answer"],
+            "analysis": ex["analysis"],
+            "difficulty": ex.get("difficulty", 1),
+            "options": options
+        })
+    return rows
 
-    for level_match in level_matches:
-        level_name = level_match[0].strip()
-        level_content = level_match[1]
 
-        # 匹配该层级下的所有模块
-        module_pattern = re.compile(r'##\s*\d+\.\s*(.+?)\n(.*?)(?=##\s*\d+\.|$)', re.DOTALL)
-        module_matches = module_pattern.findall(level_content)
+def validate_skill_tree(content):
+    """技能树回复解析不出任何模块时抛出异常"""
+    if not parse_learning_modules(content):
+        raise ValueError("解析学习模块失败，未提取到有效模块")
 
-        for module_match in module_matches:
-            module_name = module_match[0].strip()
-            module_details = module_match[1]
 
-            # 提取模块各项信息
-            duration_pattern = re.compile(r'预计学习时长：(\d+)小时')
-            duration = duration_pattern.search(module_details).group(1) if duration_pattern.search(
-                module_details) else "8"
+async def generate_module_resources(module_name, level, resource_type, use_cache=True):
+    """调用LLM生成单个模块的学习资源，返回可直接入库的资源列表"""
+    resource_prompt = build_resource_prompt(module_name, level, resource_type)
+    return parse_resources(await call_llm(resource_prompt, temperature=0.3, use_cache=use_cache,
+                                          stage="resource_llm", validate=parse_resources))
 
-            dependency_pattern = re.compile(r'前置依赖：(.+)')
-            dependency = dependency_pattern.search(module_details).group(1).strip() if dependency_pattern.search(
-                module_details) else "无"
 
-            points_pattern = re.compile(r'核心技能点：(.+)')
-            points = points_pattern.search(module_details).group(1).strip() if points_pattern.search(
-                module_details) else ""
+async def generate_module_exercises(module_name, level, use_cache=True):
+    """调用LLM生成单个模块的练习题，返回可直接入库的练习题列表"""
+    exercise_prompt = build_exercise_prompt(module_name, level)
+    return parse_exercises(await call_llm(exercise_prompt, temperature=0.3, use_cache=use_cache,
+                                          stage="exercise_llm", validate=parse_exercises))
 
-            goal_pattern = re.compile(r'学习目标：(.+)')
-            goal = goal_pattern.search(module_details).group(1).strip() if goal_pattern.search(module_details) else ""
 
-            modules.append({
-                "name": module_name,
-                "duration": duration,
-                "dependency": dependency,
-                "points": points,
-                "level": level_name,
-                "goal": goal
-            })
+async def _collect_result(future, error_msg):
+    """获取并发任务结果，单个任务失败只记录日志并返回空列表，不影响其他模块"""
+    try:
+        return await future
+    except Exception as e:
+        print(f"{error_msg}：{str(e)}")
+        return []
 
-    return modules
 
+def _completed_future(result):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(result)
+    return future
 
-# 接口1：生成学习路径（技能树）
-@app.post("/api/generate-path")
-def generate_path(request: PathRequest):
-    try:
-        prompt = build_learning_path_prompt(request.target, request.level, request.pace, request.resource_type)
-        print(f"生成的Prompt：{prompt[:200]}...")
 
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5
+def _checkpointed(checkpoint, part, fn):
+    """包装生成函数：成功生成的非空结果写入检查点"""
+    async def run(*args):
+        result = await fn(*args)
+        if checkpoint and result:
+            await asyncio.to_thread(checkpoint.save, part, result)
+        return result
+    return run
+
+
+async def _limited(semaphore, fn, *args):
+    async with semaphore:
+        return await fn(*args)
+
+
+def submit_module_enrichment(semaphore, module, level, resource_type, use_cache=True, catalog_entry=None,
+                             checkpoint=None):
+    """为单个模块创建资源、练习题生成任务（同时进行的LLM请求数受semaphore限制），返回(resource_future, exercise_future)
+
+    模块目录或检查点中已有的部分直接复用，不再调用LLM
+    """
+    resource_part = f"resources:{module['name']}"
+    saved_resources = checkpoint.get(resource_part) if checkpoint else None
+    if catalog_entry and catalog_entry["resources"]:
+        resource_future = _completed_future(catalog_entry["resources"])
+    elif saved_resources:
+        resource_future = _completed_future(saved_resources)
+    else:
+        resource_future = asyncio.create_task(_limited(
+            semaphore, _checkpointed(checkpoint, resource_part, generate_module_resources),
+            module["name"], level, resource_type, use_cache
+        ))
+
+    exercise_part = f"exercises:{module['name']}"
+    saved_exercises = checkpoint.get(exercise_part) if checkpoint else None
+    if catalog_entry and catalog_entry["exercises"]:
+        exercise_future = _completed_future(catalog_entry["exercises"])
+    elif saved_exercises:
+        exercise_future = _completed_future(saved_exercises)
+    else:
+        exercise_future = asyncio.create_task(_limited(
+            semaphore, _checkpointed(checkpoint, exercise_part, generate_module_exercises),
+            module["name"], level, use_cache
+        ))
+    return resource_future, exercise_future
+
+
+async def collect_module_enrichment(module, resource_future, exercise_future):
+    return {
+        "resources": await _collect_result(resource_future, f"生成{module['name']}资源失败"),
+        "exercises": await _collect_result(exercise_future, f"生成{module['name']}练习题失败")
+    }
+
+
+async def enrich_modules(modules, level, resource_type, on_module_done=None, use_cache=True, catalog=None,
+                         checkpoint=None):
+    """并发为所有模块生成资源和练习题，返回与modules顺序一致的结果列表
+
+    on_module_done(done_count)在每个模块的资源和练习题都结束（成功或失败）后回调；
+    catalog为load_catalog_entries的结果，目录中已有内容的模块直接复用；checkpoint中已生成的部分同样直接复用
+    """
+    catalog = catalog or {}
+    pending = [2] * len(modules)
+    done_count = [0]
+
+    def mark_done(index):
+        pending[index] -= 1
+        if pending[index] > 0:
+            return
+        done_count[0] += 1
+        if on_module_done:
+            on_module_done(done_count[0])
+
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    module_futures = [
+        submit_module_enrichment(
+            semaphore, module, level, resource_type, use_cache,
+            catalog.get(catalog_key(module["name"], level, resource_type)), checkpoint
         )
+        for module in modules
+    ]
+    for index, futures in enumerate(module_futures):
+        for future in futures:
+            future.add_done_callback(lambda _, index=index: mark_done(index))
 
-        if not response.choices or not response.choices[0].message.content:
-            raise Exception("DeepSeek返回的学习路径内容为空")
-        path_content = response.choices[0].message.content.strip()
-        print(f"AI返回的学习路径：{path_content[:200]}...")
+    try:
+        return [
+            await collect_module_enrichment(module, resource_future, exercise_future)
+            for module, (resource_future, exercise_future) in zip(modules, module_futures)
+        ]
+    finally:
+        # 生成被取消时不再继续其余模块的LLM调用
+        for futures in module_futures:
+            for future in futures:
+                future.cancel()
+
+
+# 模块目录：同名（规范化后）+ 同水平 + 同资源类型的模块共享一套资源和练习题
+def catalog_key(module_name, level, resource_type):
+    name = re.sub(r'\s+', '', unicodedata.normalize("NFKC", module_name)).lower()
+    return f"{name}|{level}|{resource_type}"
+
+
+# 写入学习路径主记录和模块记录（模块关联到目录条目），返回(path_id, 接口返回的模块列表)
+def insert_path_records(cursor, request, path_content, modules, catalog):
+    # 插入学习路径主记录
+    path_id = repository.insert_path(cursor, request.target, request.level, request.pace, request.resource_type,
+                                     path_content)
+    print(f"生成的path_id：{path_id}")
+
+    # 目录中没有的模块先批量创建目录条目
+    keys = [catalog_key(module["name"], request.level, request.resource_type) for module in modules]
+    missing = {key: (key, module["name"], request.level, request.resource_type)
+               for key, module in zip(keys, modules) if key not in catalog}
+    for key, catalog_id in repository.create_catalog_entries(cursor, list(missing.values())).items():
+        catalog[key] = {"catalog_id": catalog_id, "resources": [], "exercises": []}
+
+    # 批量插入模块记录，按顺序拿回各模块的module_id
+    catalog_ids = [catalog[key]["catalog_id"] for key in keys]
+    module_ids = repository.insert_modules(cursor, path_id, modules, catalog_ids)
+    module_list = [{
+        "module_name": module["name"],
+        "estimated_hours": module["duration"],
+        "dependency": module["dependency"],
+        "module_id": module_id,
+        "catalog_id": catalog_id,
+        "level": module["level"],
+        "goal": module["goal"],
+        "points": module["points"]
+    } for module, module_id, catalog_id in zip(modules, module_ids, catalog_ids)]
+    return path_id, module_list
+
+
+# 把新生成的资源和练习题批量写入模块目录，目录中已有的部分不重复写入（游标不跨线程使用，统一在当前线程入库）
+def insert_module_content(cursor, module_list, enrichments, catalog):
+    entries = {entry["catalog_id"]: entry for entry in catalog.values()}
+    resource_rows = []
+    exercise_rows = []
+    for module_info, enrichment in zip(module_list, enrichments):
+        catalog_id = module_info["catalog_id"]
+        entry = entries[catalog_id]
+
+        new_resources = enrichment["resources"] if not entry["resources"] else []
+        resource_rows.extend((catalog_id, res) for res in new_resources)
+
+        new_exercises = enrichment["exercises"] if not entry["exercises"] else []
+        exercise_rows.extend((catalog_id, ex) for ex in new_exercises)
+
+        # 同一路径中重复出现的模块不再写入第二份
+        entry["resources"] = entry["resources"] or new_resources
+        entry["exercises"] = entry["exercises"] or new_exercises
+        print(f"{module_info['module_name']} (catalog_id: {catalog_id})：新增{len(new_resources)}个资源，"
+              f"{len(new_exercises)}道练习题")
+
+    repository.insert_resources(cursor, resource_rows)
+    repository.insert_exercises(cursor, exercise_rows)
+
+
+# 生成学习路径的完整流程：技能树 -> 解析 -> 入库 -> 并发生成资源和练习题
+def generation_key(request):
+    """按请求参数区分一次生成，用于合并并发请求和定位检查点"""
+    raw = json.dumps([" ".join(request.target.split()), request.level, request.pace, request.resource_type,
+                      request.bypass_cache], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def lookup_catalog(modules, level, resource_type):
+    """单独借用一次连接查询模块目录，不在LLM调用期间占用连接"""
+    def lookup(conn):
+        cursor = conn.cursor()
+        with stage_timer("db_catalog_lookup"):
+            catalog = repository.load_catalog_entries(
+                cursor, [catalog_key(m["name"], level, resource_type) for m in modules]
+            )
+        cursor.close()
+        return catalog
 
-        modules = parse_learning_modules(path_content)
-        if not modules:
-            raise Exception("解析学习模块失败，未提取到有效模块")
-        print(f"解析出{len(modules)}个学习模块：{[m['name'] for m in modules]}")
+    return await db_pool.run(lookup)
+
+
+async def persist_generation(request, path_content, modules, enrichments):
+    """LLM生成全部完成后，在一个短事务内写入路径、模块、资源和练习题，返回(path_id, module_list)
 
-        conn = get_db_connection()
+    先锁住涉及的模块目录条目再重新读取：生成期间或同时有其他请求写入同一条目时，只有先提交的一方写入资源和练习题
+    """
+    def persist(conn):
         cursor = conn.cursor()
+        keys = [catalog_key(m["name"], request.level, request.resource_type) for m in modules]
+        with stage_timer("db_catalog_lookup"):
+            repository.lock_catalog(cursor, keys)
+            catalog = repository.load_catalog_entries(cursor, keys)
+        with stage_timer("db_insert_path"):
+            path_id, module_list = insert_path_records(cursor, request, path_content, modules, catalog)
+        with stage_timer("db_insert_content"):
+            insert_module_content(cursor, module_list, enrichments, catalog)
+        with stage_timer("db_commit"):
+            conn.commit()
+        cursor.close()
+        return path_id, module_list
 
-        # 插入学习路径主记录
-        cursor.execute('''
-        INSERT INTO LEARNING_PATH (target, level, pace, resource_type, path_content)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (request.target, request.level, request.pace, request.resource_type, path_content))
-
-        # 获取path_id
-        cursor.execute("SELECT IDENT_CURRENT('LEARNING_PATH')")
-        path_id_result = cursor.fetchone()
-        if not path_id_result or path_id_result[0] is None:
-            raise Exception("插入学习路径后，获取path_id失败（返回空）")
-        path_id = int(path_id_result[0])
-        print(f"生成的path_id：{path_id}")
-
-        # 插入模块+生成资源+练习题
-        module_list = []
-        for module in modules:
-            cursor.execute('''
-            INSERT INTO LEARNING_MODULE (path_id, module_name, estimated_hours, dependency, level, learning_goal)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (path_id, module["name"], module["duration"], module["dependency"], module["level"], module["goal"]))
-
-            cursor.execute("SELECT IDENT_CURRENT('LEARNING_MODULE')")
-            module_id = int(cursor.fetchone()[0])
-            module_list.append({
-                "module_name": module["name"],
-                "estimated_hours": module["duration"],
-                "dependency": module["dependency"],
-                "module_id": module_id,
-                "level": module["level"],
-                "goal": module["goal"],
-                "points": module["points"]
-            })
-
-            print(f"\n处理模块：{module['name']} (module_id: {module_id})")
-
-            # 生成学习资源
-            try:
-                print(f"生成{module['name']}的学习资源...")
-                resource_prompt = build_resource_prompt(module["name"], request.level, request.resource_type)
-                resource_response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[{"role": "user", "content": resource_prompt}],
-                    temperature=0.3
-                )
+    path_id, module_list = await db_pool.run(persist)
+    content_cache.invalidate(*[("catalog", module["catalog_id"]) for module in module_list])
+    return path_id, module_list
 
-                resource_content = resource_response.choices[0].message.content.strip()
-                resource_content = re.sub(r'^```json|```$', '', resource_content).strip()
-                resources = json.loads(resource_content)
-
-                for res in resources:
-                    cursor.execute('''
-                    INSERT INTO LEARNING_RESOURCE (module_id, title, url, source, tag, type)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        module_id,
-                        res.get("title", ""),
-                        res.get("url", ""),
-                        res.get("source", ""),
-                        res.get("tag", ""),
-                        res.get("type", "")
-                    ))
-                print(f"成功插入{len(resources)}个{module['name']}的学习资源")
-            except Exception as e:
-                print(f"生成{module['name']}资源失败：{str(e)}")
 
-            # 生成练习题
-            try:
-                print(f"生成{module['name']}的练习题...")
-                exercise_prompt = build_exercise_prompt(module["name"], request.level)
-                exercise_response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[{"role": "user", "content": exercise_prompt}],
-                    temperature=0.3
-                )
+async def run_generate_path(request, report=None):
+    """执行一次完整生成，report(stage, **progress)用于向后台任务上报进度，返回接口data字段
 
-                exercise_content = exercise_response.choices[0].message.content.strip()
-                exercise_content = re.sub(r'^```json|```$', '', exercise_content).strip()
-                exercises = json.loads(exercise_content)
-
-                for ex in exercises:
-                    if ex.get("type") == "single_choice":
-                        question = f"{ex['question']}\n选项：{', '.join(ex['options'])}"
-                        # 额外存储options用于前端展示
-                        options = ','.join(ex['options'])
-                    else:
-                        question = ex["question"]
-                        options = ""
-
-                    cursor.execute('''
-                    INSERT INTO EXERCISE (module_id, question, answer, analysis, difficulty, options)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        module_id,
-                        question,
-                        ex["answer"],
-                        ex["analysis"],
-                        ex.get("difficulty", 1),
-                        options
-                    ))
-                print(f"成功插入{len(exercises)}个{module['name']}的练习题")
-            except Exception as e:
-                print(f"生成{module['name']}练习题失败：{str(e)}")
+    先完成全部LLM调用（结果逐项写入检查点），最后一次性入库；失败后相同参数重试从检查点继续
+    """
+    report = report or (lambda stage, **progress: None)
+    checkpoint = await asyncio.to_thread(checkpoints.open, generation_key(request))
+    try:
+        report("生成技能树")
+        path_content = checkpoint.get("path")
+        if path_content is None:
+            with stage_timer("prompt_build"):
+                prompt = build_learning_path_prompt(request.target, request.level, request.pace,
+                                                    request.resource_type)
+            print(f"生成的Prompt：{prompt[:200]}...")
+            path_content = await call_llm(prompt, temperature=0.5, use_cache=not request.bypass_cache,
+                                          stage="path_llm", validate=validate_skill_tree)
+            print(f"AI返回的学习路径：{path_content[:200]}...")
+        else:
+            print("从检查点恢复学习路径生成")
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with stage_timer("parse"):
+            modules = parse_learning_modules(path_content)
+        if not modules:
+            raise Exception("解析学习模块失败，未提取到有效模块")
+        if checkpoint.get("path") is None:
+            await asyncio.to_thread(checkpoint.save, "path", path_content)
+        print(f"解析出{len(modules)}个学习模块：{[m['name'] for m in modules]}")
+        report("技能树解析完成", total_modules=len(modules), enriched_modules=0)
+
+        if ENRICHMENT_MODE == "lazy":
+            # 只保存技能树，资源和练习题在首次查询时生成
+            enrichments = [{"resources": [], "exercises": []} for _ in modules]
+        else:
+            # 并发生成目录和检查点中都还没有的资源和练习题
+            catalog = await lookup_catalog(modules, request.level, request.resource_type)
+            report("生成资源和练习题")
+            with stage_timer("enrichment"):
+                enrichments = await enrich_modules(
+                    modules, request.level, request.resource_type,
+                    on_module_done=lambda done: report("生成资源和练习题", enriched_modules=done),
+                    use_cache=not request.bypass_cache,
+                    catalog=catalog,
+                    checkpoint=checkpoint
+                )
+
+        report("保存学习路径")
+        path_id, module_list = await persist_generation(request, path_content, modules, enrichments)
+        await asyncio.to_thread(checkpoint.clear)
+        if ENRICHMENT_MODE == "lazy":
+            prefetch_modules([module["catalog_id"] for module in module_list[:PREFETCH_MODULES]])
 
         return {
-            "code": 200,
-            "msg": "生成成功",
-            "data": {
-                "path_id": path_id,
-                "path_content": path_content,
-                "modules": module_list,
-                "create_time": "2025-01-01 10:00:00"
-            }
+            "path_id": path_id,
+            "path_content": path_content,
+            "modules": module_list,
+            "create_time": "2025-01-01 10:00:00"
         }
-    except Exception as e:
+    except Exception:
         import traceback
         error_detail = traceback.format_exc()
         print("=" * 50 + "详细报错信息" + "=" * 50)
         print(error_detail)
         print("=" * 100)
-        raise HTTPException(status_code=500, detail=f"生成失败：{str(e)}")
+        raise
 
 
-# 接口2：获取学习资源
-@app.get("/api/get-resources")
-def get_resources(module_name: str, resource_type: str = None):
-    try:
-        conn = get_db_connection()
+async def enrich_on_demand(catalog_id, kind):
+    """模块目录条目还没有资源（kind="resources"）或练习题（kind="exercises"）时调用LLM生成并入库，返回新增条数
+
+    同一条目的并发请求（包括本机其他worker进程）只生成一次，其余请求等待并共享其结果
+    """
+    def load(conn):
         cursor = conn.cursor()
+        entry = repository.load_catalog_entry(cursor, catalog_id)
+        cursor.close()
+        return entry
 
-        cursor.execute('SELECT module_id FROM LEARNING_MODULE WHERE module_name = ?', (module_name,))
-        module_result = cursor.fetchone()
-        if not module_result:
-            raise HTTPException(status_code=404, detail="模块不存在")
-        module_id = module_result[0]
+    def save(conn, entry, rows):
+        cursor = conn.cursor()
+        # 生成期间其他机器上的实例或生成整条路径的请求可能已经写入，加锁后再检查一次
+        repository.lock_catalog(cursor, [catalog_key(entry["module_name"], entry["level"], entry["resource_type"])])
+        entry = repository.load_catalog_entry(cursor, catalog_id)
+        if entry[f"{kind}_count"]:
+            cursor.close()
+            return 0
+        insert = repository.insert_resources if kind == "resources" else repository.insert_exercises
+        insert(cursor, [(catalog_id, row) for row in rows])
+        conn.commit()
+        cursor.close()
+        return len(rows)
+
+    async def enrich():
+        entry = await db_pool.run(load)
+        if entry is None or entry[f"{kind}_count"]:
+            return 0
+        if kind == "resources":
+            rows = await generate_module_resources(entry["module_name"], entry["level"], entry["resource_type"])
+        else:
+            rows = await generate_module_exercises(entry["module_name"], entry["level"])
+        label = "资源" if kind == "resources" else "练习题"
+        print(f"按需生成{entry['module_name']} (catalog_id: {catalog_id})：新增{len(rows)}条{label}")
+        added = await db_pool.run(lambda conn: save(conn, entry, rows)) if rows else 0
+        content_cache.invalidate(("catalog", catalog_id))
+        return added
 
-        query = 'SELECT * FROM LEARNING_RESOURCE WHERE module_id = ?'
-        params = [module_id]
-        if resource_type:
-            query += ' AND type = ?'
-            params.append(resource_type)
+    return await single_flight.do(f"enrich:{kind}:{catalog_id}", enrich)
 
-        cursor.execute(query, params)
-        columns = [column[0] for column in cursor.description]
-        resources = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-        cursor.close()
-        conn.close()
+# 后台预取任务：保留引用避免任务被回收，同时进行的预取数受LLM_CONCURRENCY限制
+prefetch_tasks = set()
+prefetch_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
 
-        return {
-            "code": 200,
-            "msg": "查询成功",
-            "data": resources
-        }
-    except HTTPException as e:
-        raise e
+
+async def _prefetch(catalog_id, kind):
+    try:
+        async with prefetch_semaphore:
+            await enrich_on_demand(catalog_id, kind)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
+        label = "资源" if kind == "resources" else "练习题"
+        print(f"预取模块目录{catalog_id}的{label}失败：{str(e)}")
 
 
-# 接口3：获取练习题（含options字段）
-@app.get("/api/get-exercises")
-def get_exercises(module_name: str):
+def prefetch_modules(catalog_ids):
+    """在后台为这些模块目录条目生成还没有的资源和练习题，失败只记录日志"""
+    for catalog_id in dict.fromkeys(catalog_ids):
+        for kind in ("resources", "exercises"):
+            task = asyncio.create_task(_prefetch(catalog_id, kind))
+            prefetch_tasks.add(task)
+            task.add_done_callback(prefetch_tasks.discard)
+
+
+async def load_module_content(module_id, catalog_id, kind):
+    """接口查询到的资源/练习题为空时按需生成，有新增内容时返回True；懒加载模式下同时在后台预取路径中的后续模块"""
+    if catalog_id is None:
+        return False
+    label = "资源" if kind == "resources" else "练习题"
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        added = await enrich_on_demand(catalog_id, kind)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成{label}失败：{str(e)}")
+    if added and ENRICHMENT_MODE == "lazy" and PREFETCH_MODULES:
+        def next_modules(conn):
+            cursor = conn.cursor()
+            catalog_ids = repository.next_catalog_ids(cursor, module_id, PREFETCH_MODULES)
+            cursor.close()
+            return catalog_ids
 
-        cursor.execute('SELECT module_id FROM LEARNING_MODULE WHERE module_name = ?', (module_name,))
-        module_result = cursor.fetchone()
-        if not module_result:
-            raise HTTPException(status_code=404, detail="模块不存在")
-        module_id = module_result[0]
+        prefetch_modules(await run_db(next_modules))
+    return added > 0
 
-        cursor.execute('SELECT * FROM EXERCISE WHERE module_id = ?', (module_id,))
-        columns = [column[0] for column in cursor.description]
-        exercises = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-        # 解析options为列表
-        for ex in exercises:
-            if ex.get('options'):
-                ex['options'] = ex['options'].split(',')
-            else:
-                ex['options'] = []
+async def generate_path_once(request, report=None):
+    """合并并发的相同生成请求：参数相同的请求共享同一次生成结果（同一个path_id）"""
+    flight_key = "path:" + generation_key(request)
+    on_wait = (lambda: report("等待相同的生成请求完成")) if report else None
+    return await single_flight.do(flight_key, lambda: run_generate_path(request, report), on_wait=on_wait)
 
-        cursor.close()
-        conn.close()
 
-        return {
-            "code": 200,
-            "msg": "查询成功",
-            "data": exercises
-        }
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
+# 接口1：生成学习路径（技能树），等待生成完成；支持Idempotency-Key请求头，超时重试不会重复生成
+@app.post("/api/generate-path")
+async def generate_path(request: PathRequest, response: Response,
+                        idempotency_key: str = Header(None, alias="Idempotency-Key")):
+    async def handler():
+        try:
+            return {
+                "code": 200,
+                "msg": "生成成功",
+                "data": await generate_path_once(request)
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"生成失败：{str(e)}")
 
+    return await run_idempotent("generate-path", idempotency_key, request, response, handler)
 
-# 接口4：更新学习进度（移除progress字段）
-@app.post("/api/update-progress")
-def update_progress(request: ProgressRequest):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
 
-        # 检查进度是否已存在
-        cursor.execute('''
-        SELECT progress_id FROM USER_PROGRESS WHERE path_id = ? AND module_name = ?
-        ''', (request.path_id, request.module_name))
-        progress = cursor.fetchone()
-
-        if progress:
-            # 更新进度（移除progress字段）
-            cursor.execute('''
-            UPDATE USER_PROGRESS SET status = ?, accuracy = ?, update_time = GETDATE()
-            WHERE path_id = ? AND module_name = ?
-            ''', (request.status, request.accuracy, request.path_id, request.module_name))
-            progress_id = progress[0]
+def sse_event(event, data):
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_generate_path_events(request):
+    """流式生成学习路径：模块输出完整后立即推送并开始生成其资源和练习题，全部完成后统一入库"""
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    events = asyncio.Queue()
+    modules = []
+    enrichments = []
+    catalog = {}
+    futures = []
+    pending = [0]  # 已提交但尚未推送的资源/练习题结果数
+    checkpoint = await asyncio.to_thread(checkpoints.open, generation_key(request))
+
+    async def start_module(module):
+        index = len(modules)
+        modules.append(module)
+        enrichments.append({"resources": [], "exercises": []})
+        # 懒加载模式只推送模块，不生成资源和练习题
+        if ENRICHMENT_MODE == "eager":
+            key = catalog_key(module["name"], request.level, request.resource_type)
+            if key not in catalog:
+                catalog.update(await lookup_catalog([module], request.level, request.resource_type))
+            module_futures = submit_module_enrichment(
+                semaphore, module, request.level, request.resource_type, not request.bypass_cache,
+                catalog.get(key), checkpoint
+            )
+            for kind, future in zip(("resources", "exercises"), module_futures):
+                pending[0] += 1
+                futures.append(future)
+                future.add_done_callback(lambda f, kind=kind: events.put_nowait((kind, index, f)))
+        return sse_event("module", {"index": index, **module})
+
+    async def enrichment_events(wait):
+        while pending[0]:
+            try:
+                if wait:
+                    kind, index, future = await asyncio.wait_for(events.get(), SSE_KEEPALIVE_SECONDS)
+                else:
+                    kind, index, future = events.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                if not wait:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            pending[0] -= 1
+            module_name = modules[index]["name"]
+            label = "资源" if kind == "resources" else "练习题"
+            enrichments[index][kind] = await _collect_result(future, f"生成{module_name}{label}失败")
+            yield sse_event(kind, {"index": index, "module_name": module_name, "data": enrichments[index][kind]})
+
+    async def saved_deltas(content):
+        yield content
+
+    try:
+        saved_path = checkpoint.get("path")
+        if saved_path is None:
+            with stage_timer("prompt_build"):
+                prompt = build_learning_path_prompt(request.target, request.level, request.pace,
+                                                    request.resource_type)
+            deltas = stream_llm(prompt, temperature=0.5, use_cache=not request.bypass_cache, stage="path_llm",
+                                validate=validate_skill_tree)
         else:
-            # 新增进度（移除progress字段）
-            cursor.execute('''
-            INSERT INTO USER_PROGRESS (path_id, module_name, status, accuracy)
-            VALUES (?, ?, ?, ?)
-            ''', (request.path_id, request.module_name, request.status, request.accuracy))
-
-            cursor.execute("SELECT IDENT_CURRENT('USER_PROGRESS')")
-            progress_id_result = cursor.fetchone()
-            if not progress_id_result or progress_id_result[0] is None:
-                raise Exception("插入进度后，获取progress_id失败（返回空）")
-            progress_id = int(progress_id_result[0])
+            deltas = saved_deltas(saved_path)
+        parser = SkillTreeParser()
+        chunks = []
+        async for delta in deltas:
+            chunks.append(delta)
+            for module in parser.feed(delta):
+                yield await start_module(module)
+            async for event in enrichment_events(wait=False):
+                yield event
+
+        path_content = "".join(chunks).strip()
+        for module in parser.close():
+            yield await start_module(module)
+        if not modules:
+            raise Exception("解析学习模块失败，未提取到有效模块")
+        if checkpoint.get("path") is None:
+            await asyncio.to_thread(checkpoint.save, "path", path_content)
+        print(f"解析出{len(modules)}个学习模块：{[m['name'] for m in modules]}")
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        async for event in enrichment_events(wait=True):
+            yield event
 
-        return {
-            "code": 200,
-            "msg": "更新成功",
-            "data": {
-                "progress_id": progress_id,
-                "update_time": "2025-01-01 11:00:00"
-            }
-        }
+        path_id, module_list = await persist_generation(request, path_content, modules, enrichments)
+        await asyncio.to_thread(checkpoint.clear)
+        if ENRICHMENT_MODE == "lazy":
+            prefetch_modules([module["catalog_id"] for module in module_list[:PREFETCH_MODULES]])
+
+        yield sse_event("done", {
+            "path_id": path_id,
+            "path_content": path_content,
+            "modules": module_list,
+            "create_time": "2025-01-01 10:00:00"
+        })
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"更新失败：{str(e)}")
+        import traceback
+        print("=" * 50 + "流式生成报错" + "=" * 50)
+        print(traceback.format_exc())
+        print("=" * 100)
+        yield sse_event("error", {"detail": f"生成失败：{str(e)}"})
+    finally:
+        # 客户端断开或生成结束时取消尚未完成的资源/练习题生成
+        for future in futures:
+            future.cancel()
+
+
+# 接口1-0：流式生成学习路径（SSE），依次推送module / resources / exercises事件，最后推送done或error
+@app.post("/api/generate-path/stream")
+async def generate_path_stream(request: PathRequest):
+    return StreamingResponse(
+        stream_generate_path_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# 后台生成任务池（工作者协程在应用启动时创建）；任务状态与LLM缓存共用同一个本地SQLite文件，本机多个worker进程共享
+job_manager = JobManager(
+    handler=generate_path_once,
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    lane_limits={
+        "interactive": int(os.getenv("JOB_QUEUE_INTERACTIVE", "20")),
+        "bulk": int(os.getenv("JOB_QUEUE_BULK", "50"))
+    },
+    store=JobStore(path=llm_cache.path, result_ttl=3600)
+)
 
 
-# 接口5：提交答题记录
-@app.post("/api/submit-answer")
-def submit_answer(request: AnswerRequest):
+# 接口1-1：提交后台生成任务，立即返回job_id
+@app.post("/api/jobs/generate-path", status_code=202)
+async def submit_generate_job(request: GenerateJobRequest):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        job = await job_manager.submit(request, lane=request.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"生成任务排队已满（{e.lane}），请{e.retry_after}秒后重试",
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
-        # 检查答题记录是否存在
-        cursor.execute('''
-        SELECT answer_id FROM USER_ANSWER WHERE path_id = ? AND module_name = ? AND exercise_id = ?
-        ''', (request.path_id, request.module_name, request.exercise_id))
-        answer_record = cursor.fetchone()
-
-        if answer_record:
-            # 更新答题记录
-            cursor.execute('''
-            UPDATE USER_ANSWER SET user_answer = ?, is_correct = ?, submit_time = GETDATE()
-            WHERE path_id = ? AND module_name = ? AND exercise_id = ?
-            ''', (request.user_answer, request.is_correct, request.path_id, request.module_name, request.exercise_id))
-            answer_id = answer_record[0]
-        else:
-            # 新增答题记录
-            cursor.execute('''
-            INSERT INTO USER_ANSWER (path_id, module_name, exercise_id, user_answer, is_correct)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (request.path_id, request.module_name, request.exercise_id, request.user_answer, request.is_correct))
-
-            cursor.execute("SELECT IDENT_CURRENT('USER_ANSWER')")
-            answer_id_result = cursor.fetchone()
-            if not answer_id_result or answer_id_result[0] is None:
-                raise Exception("插入答题记录失败，获取answer_id失败")
-            answer_id = int(answer_id_result[0])
+    return {
+        "code": 202,
+        "msg": "任务已提交",
+        "data": job.to_dict()
+    }
+
+
+# 后台任务池运行状态（工作线程数、各通道排队数）
+@app.get("/api/jobs/stats")
+async def get_job_stats():
+    return {
+        "code": 200,
+        "msg": "查询成功",
+        "data": job_manager.stats()
+    }
+
+
+# 接口1-2：查询后台生成任务状态与进度
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return {
+        "code": 200,
+        "msg": "查询成功",
+        "data": job.to_dict()
+    }
+
+
+# 接口1-3：获取后台生成任务结果（结构与/api/generate-path一致）
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"生成失败：{job.error}")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"任务尚未完成，当前状态：{job.stage}")
+    return {
+        "code": 200,
+        "msg": "生成成功",
+        "data": job.result
+    }
+
+
+def build_path_view(path):
+    """把路径和模块记录拼成与生成结果一致的模块列表及技能总览表格；技能点不入库，从path_content解析"""
+    parsed = {(module["level"], module["name"]): module for module in parse_learning_modules(path["path_content"])}
+    modules = []
+    for row in path["modules"]:
+        module = parsed.get((row["level"], row["module_name"]), {})
+        modules.append({
+            "module_name": row["module_name"],
+            "estimated_hours": row["estimated_hours"],
+            "dependency": row["dependency"],
+            "module_id": row["module_id"],
+            "catalog_id": row["catalog_id"],
+            "level": row["level"],
+            "goal": row["learning_goal"] or module.get("goal", ""),
+            "points": module.get("points", "")
+        })
+    # 技能总览表格的行（学习目标截断到SUMMARY_GOAL_LENGTH字），随解析结果一起缓存，前端直接渲染
+    summary = [{
+        "module_name": module["module_name"],
+        "level": module["level"],
+        "estimated_hours": module["estimated_hours"],
+        "dependency": module["dependency"],
+        "goal": module["goal"][:SUMMARY_GOAL_LENGTH] + "..." if len(module["goal"]) > SUMMARY_GOAL_LENGTH
+        else module["goal"]
+    } for module in modules]
+    return {key: path[key] for key in ("path_id", "target", "level", "pace", "resource_type")} | {
+        "modules": modules, "summary": summary
+    }
+
+
+# 接口1-4：查询已生成的学习路径及其模块（modules结构与生成结果一致），解析结果按path_id缓存
+@app.get("/api/path/{path_id}")
+async def get_path(path_id: int):
+    data = path_cache.get(("path", path_id))
+    if data is None:
+        def query(conn):
+            try:
+                cursor = conn.cursor()
+                path = repository.load_path(cursor, path_id)
+                cursor.close()
+                return path
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        path = await run_db(query)
+        if not path:
+            raise HTTPException(status_code=404, detail="学习路径不存在")
+        data = build_path_view(path)
+        path_cache.set(("path", path_id), data)
 
-        return {
-            "code": 200,
-            "msg": "答题记录提交成功",
-            "data": {
-                "answer_id": answer_id
+    return {
+        "code": 200,
+        "msg": "查询成功",
+        "data": data
+    }
+
+
+# LLM缓存命中统计，checkpoints为生成断点的保存/恢复统计，content为资源/练习题查询缓存统计，paths为路径解析结果缓存统计
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    cache_stats, checkpoint_stats = await asyncio.gather(
+        asyncio.to_thread(llm_cache.stats), asyncio.to_thread(checkpoints.stats)
+    )
+    return {
+        "code": 200,
+        "msg": "查询成功",
+        "data": {**cache_stats, "checkpoints": checkpoint_stats, "content": content_cache.stats(),
+                 "paths": path_cache.stats()}
+    }
+
+
+# 数据库连接池状态
+@app.get("/api/db/stats")
+async def get_db_stats():
+    return {
+        "code": 200,
+        "msg": "查询成功",
+        "data": db_pool.stats()
+    }
+
+
+# Prometheus指标：各阶段耗时与token用量、接口请求数/错误数/耗时
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def content_etag(data):
+    """按查询结果内容计算强ETag"""
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match（可含多个ETag或*）是否与etag匹配，按弱比较忽略W/前缀"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def content_owner(module_id, catalog_id):
+    """资源/练习题所属的对象：新数据挂在模块目录条目下，早期数据按模块"""
+    return ("catalog", catalog_id) if catalog_id is not None else ("module", module_id)
+
+
+async def serve_module_content(kind, module_name, params, load, response, if_none_match):
+    """读穿content_cache返回模块的资源或练习题，带ETag和Cache-Control；If-None-Match匹配时返回304
+
+    模块名先映射到(module_id, catalog_id)，内容按模块目录条目缓存（早期数据按模块），两者都命中时不访问数据库。
+    load()查询数据库并返回(module_id, catalog_id, data)；空结果不缓存，之后可能按需生成。
+    """
+    ids = content_cache.get(("module", module_name))
+    entry = content_cache.get((kind, content_owner(*ids), *params)) if ids else None
+
+    if entry is None:
+        module_id, catalog_id, data = await load()
+        entry = {"data": data, "etag": content_etag(data)}
+        if data:
+            content_cache.set(("module", module_name), (module_id, catalog_id))
+            content_cache.set((kind, content_owner(module_id, catalog_id), *params), entry)
+
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": f"private, max-age={CONTENT_CACHE_MAX_AGE}" if entry["data"] else "no-cache"
+    }
+    if etag_matches(if_none_match, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {
+        "code": 200,
+        "msg": "查询成功",
+        "data": entry["data"]
+    }
+
+
+# 接口2：获取学习资源（模块还没有资源时按需生成）；支持If-None-Match条件请求
+@app.get("/api/get-resources")
+async def get_resources(module_name: str, response: Response, resource_type: str = None,
+                        if_none_match: str = Header(None, alias="If-None-Match")):
+    def query(conn):
+        try:
+            cursor = conn.cursor()
+
+            module_result = repository.find_module(cursor, module_name)
+            if not module_result:
+                raise HTTPException(status_code=404, detail="模块不存在")
+            module_id, catalog_id = module_result
+
+            resources = repository.list_resources(cursor, module_id, catalog_id, resource_type)
+
+            cursor.close()
+
+            return module_id, catalog_id, resources
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
+
+    async def load():
+        module_id, catalog_id, resources = await run_db(query)
+        # 模块还没有资源（懒加载模式首次查询，或生成路径时该模块生成失败）时现在生成
+        if not resources and await load_module_content(module_id, catalog_id, "resources"):
+            module_id, catalog_id, resources = await run_db(query)
+        return module_id, catalog_id, resources
+
+    return await serve_module_content("resources", module_name, (resource_type,), load, response, if_none_match)
+
+
+# 接口3：获取练习题（含options字段，模块还没有练习题时按需生成）；支持If-None-Match条件请求
+@app.get("/api/get-exercises")
+async def get_exercises(module_name: str, response: Response,
+                        if_none_match: str = Header(None, alias="If-None-Match")):
+    def query(conn):
+        try:
+            cursor = conn.cursor()
+
+            module_result = repository.find_module(cursor, module_name)
+            if not module_result:
+                raise HTTPException(status_code=404, detail="模块不存在")
+            module_id, catalog_id = module_result
+
+            exercises = repository.list_exercises(cursor, module_id, catalog_id)
+
+            # 解析options为列表
+            for ex in exercises:
+                if ex.get('options'):
+                    ex['options'] = ex['options'].split(',')
+                else:
+                    ex['options'] = []
+
+            cursor.close()
+
+            return module_id, catalog_id, exercises
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
+
+    async def load():
+        module_id, catalog_id, exercises = await run_db(query)
+        # 模块还没有练习题时现在生成（同获取学习资源）
+        if not exercises and await load_module_content(module_id, catalog_id, "exercises"):
+            module_id, catalog_id, exercises = await run_db(query)
+        return module_id, catalog_id, exercises
+
+    return await serve_module_content("exercises", module_name, (), load, response, if_none_match)
+
+
+# 接口4：更新学习进度（移除progress字段）
+@app.post("/api/update-progress")
+async def update_progress(request: ProgressRequest):
+    def save(conn):
+        try:
+            cursor = conn.cursor()
+
+            # 新增或更新进度（移除progress字段）
+            progress_id = repository.save_progress(cursor, request.path_id, request.module_name, request.status,
+                                                   request.accuracy)
+
+            conn.commit()
+            cursor.close()
+
+            return {
+                "code": 200,
+                "msg": "更新成功",
+                "data": {
+                    "progress_id": progress_id,
+                    "update_time": "2025-01-01 11:00:00"
+                }
             }
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"提交答题记录失败：{str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"更新失败：{str(e)}")
+
+    return await run_db(save)
+
+
+# 接口5：提交答题记录；支持Idempotency-Key请求头
+@app.post("/api/submit-answer")
+async def submit_answer(request: AnswerRequest, response: Response,
+                        idempotency_key: str = Header(None, alias="Idempotency-Key")):
+    def save(conn):
+        try:
+            cursor = conn.cursor()
+
+            # 新增或更新答题记录
+            answer_id = repository.save_answer(cursor, request.path_id, request.module_name, request.exercise_id,
+                                               request.user_answer, request.is_correct)
+
+            conn.commit()
+            cursor.close()
+
+            return {
+                "code": 200,
+                "msg": "答题记录提交成功",
+                "data": {
+                    "answer_id": answer_id
+                }
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"提交答题记录失败：{str(e)}")
+
+    return await run_idempotent("submit-answer", idempotency_key, request, response, lambda: run_db(save))
+
+
+# 接口5-1：批量提交同一模块的答题记录，一个事务内写入，返回每题结果和模块最新正确率；支持Idempotency-Key请求头
+@app.post("/api/submit-answers")
+async def submit_answers(request: AnswerSheetRequest, response: Response,
+                         idempotency_key: str = Header(None, alias="Idempotency-Key")):
+    exercise_ids = [answer.exercise_id for answer in request.answers]
+    if len(set(exercise_ids)) != len(exercise_ids):
+        raise HTTPException(status_code=400, detail="答题卡中有重复的题目")
+
+    def save(conn):
+        try:
+            cursor = conn.cursor()
+
+            answer_ids = repository.save_answers(cursor, request.path_id, request.module_name, [
+                (answer.exercise_id, answer.user_answer, answer.is_correct) for answer in request.answers
+            ])
+            total, correct = repository.answer_stats(cursor, request.path_id, request.module_name)
+
+            conn.commit()
+            cursor.close()
+
+            return {
+                "code": 200,
+                "msg": "答题记录提交成功",
+                "data": {
+                    "results": [{
+                        "exercise_id": answer.exercise_id,
+                        "answer_id": answer_id,
+                        "is_correct": answer.is_correct
+                    } for answer, answer_id in zip(request.answers, answer_ids)],
+                    **accuracy_summary(total, correct)
+                }
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"提交答题记录失败：{str(e)}")
+
+    return await run_idempotent("submit-answers", idempotency_key, request, response, lambda: run_db(save))
+
+
+def accuracy_summary(total, correct):
+    return {
+        "total": total,
+        "correct": correct,
+        "accuracy": round((correct / total * 100) if total > 0 else 0.0, 2)
+    }
 
 
 # 接口6：获取正确率统计（移除progress相关字段）
 @app.post("/api/get-accuracy")
-def get_accuracy(request: AccuracyRequest):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+async def get_accuracy(request: AccuracyRequest):
+    def query(conn):
+        try:
+            cursor = conn.cursor()
 
-        if request.module_name:
-            # 获取指定模块正确率
-            cursor.execute('''
-            SELECT 
-                COUNT(ua.is_correct) as total, 
-                SUM(CASE WHEN ua.is_correct = 1 THEN 1 ELSE 0 END) as correct
-            FROM USER_ANSWER ua
-            LEFT JOIN USER_PROGRESS up ON ua.path_id = up.path_id AND ua.module_name = up.module_name
-            WHERE ua.path_id = ? AND ua.module_name = ?
-            GROUP BY ua.path_id, ua.module_name
-            ''', (request.path_id, request.module_name))
-        else:
-            # 获取总体正确率
-            cursor.execute('''
-            SELECT 
-                COUNT(ua.is_correct) as total, 
-                SUM(CASE WHEN ua.is_correct = 1 THEN 1 ELSE 0 END) as correct
-            FROM USER_ANSWER ua
-            LEFT JOIN USER_PROGRESS up ON ua.path_id = up.path_id AND ua.module_name = up.module_name
-            WHERE ua.path_id = ?
-            GROUP BY ua.path_id
-            ''', (request.path_id,))
-
-        result = cursor.fetchone()
-        # 处理无数据的情况（默认返回0）
-        total = result[0] if (result and result[0] is not None) else 0
-        correct = result[1] if (result and result[1] is not None) else 0
-
-        accuracy = (correct / total * 100) if total > 0 else 0.0
+            # 获取指定模块或总体的答题数/答对数（无数据时为0）
+            total, correct = repository.answer_stats(cursor, request.path_id, request.module_name)
 
-        cursor.close()
-        conn.close()
+            cursor.close()
 
-        return {
-            "code": 200,
-            "msg": "查询成功",
-            "data": {
-                "total": total,
-                "correct": correct,
-                "accuracy": round(accuracy, 2)
+            return {
+                "code": 200,
+                "msg": "查询成功",
+                "data": accuracy_summary(total, correct)
             }
-        }
-    except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print("=" * 50 + "get-accuracy报错" + "=" * 50)
-        print(error_detail)
-        print("=" * 100)
-        raise HTTPException(status_code=500, detail=f"查询正确率失败：{str(e)}")
+        except Exception as e:
+            import traceback
+            error_detail = traceback.format_exc()
+            print("=" * 50 + "get-accuracy报错" + "=" * 50)
+            print(error_detail)
+            print("=" * 100)
+            raise HTTPException(status_code=500, detail=f"查询正确率失败：{str(e)}")
+
+    return await run_db(query)
+
+
+# 接口6-1：一次查询返回路径的总体、各层级、各模块正确率（没答过题的模块正确率为0）
+@app.post("/api/get-accuracy-breakdown")
+async def get_accuracy_breakdown(request: AccuracyBreakdownRequest):
+    def query(conn):
+        try:
+            cursor = conn.cursor()
+            breakdown = repository.accuracy_breakdown(cursor, request.path_id)
+            cursor.close()
+
+            return {
+                "code": 200,
+                "msg": "查询成功",
+                "data": {
+                    "overall": accuracy_summary(*breakdown["overall"]),
+                    "levels": [{"level": level, **accuracy_summary(total, correct)}
+                               for level, total, correct in breakdown["levels"]],
+                    "modules": [{"module_name": module_name, "level": level, **accuracy_summary(total, correct)}
+                                for module_name, level, total, correct in breakdown["modules"]]
+                }
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"查询正确率失败：{str(e)}")
+
+    return await run_db(query)
 
 
 # 启动服务
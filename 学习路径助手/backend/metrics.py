@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认耗时分桶（秒），覆盖数据库语句（毫秒级）到LLM调用（数十秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """只增计数器"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Gauge:
+    """可增可减的瞬时值"""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """累积分桶直方图，输出_bucket/_sum/_count"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}  # 标签值 -> [各桶计数（不累积）, 总和, 总数]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标注册表，按Prometheus文本格式输出（多worker进程时各进程分别统计）"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "learnpath_stage_duration_seconds", "生成流程各阶段耗时（秒）", ["stage"]
+)
+STAGE_ERRORS = registry.counter(
+    "learnpath_stage_errors_total", "生成流程各阶段失败次数", ["stage"]
+)
+LLM_TOKENS = registry.counter(
+    "learnpath_llm_tokens_total", "LLM调用消耗的token数，kind为prompt或completion", ["stage", "kind"]
+)
+HTTP_REQUESTS = registry.counter(
+    "learnpath_http_requests_total", "接口请求数", ["method", "endpoint", "status"]
+)
+HTTP_ERRORS = registry.counter(
+    "learnpath_http_request_errors_total", "接口返回5xx或抛出未处理异常的次数", ["method", "endpoint"]
+)
+HTTP_DURATION = registry.histogram(
+    "learnpath_http_request_duration_seconds", "接口耗时（秒，流式接口为推送完成的耗时）", ["method", "endpoint"]
+)
+
+DB_POOL_CONNECTIONS = registry.gauge(
+    "learnpath_db_pool_connections", "连接池中的连接数，state为idle或in_use", ["state"]
+)
+DB_POOL_WAITING = registry.gauge(
+    "learnpath_db_pool_waiting", "等待获取连接的请求数"
+)
+DB_POOL_CHECKOUT = registry.histogram(
+    "learnpath_db_pool_checkout_seconds", "从连接池获取连接的耗时（秒，含等待、健康检查和新建连接）",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+DB_POOL_EVENTS = registry.counter(
+    "learnpath_db_pool_events_total", "连接池事件：created/timeout，以及按原因关闭的连接（closed_idle/closed_lifetime/closed_broken）",
+    ["event"]
+)
+
+
+@contextmanager
+def stage_timer(stage):
+    """统计代码块耗时到STAGE_DURATION，抛出异常时同时计入STAGE_ERRORS"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_tokens(stage, usage):
+    """记录一次LLM调用的token用量，usage为{"prompt_tokens": .., "completion_tokens": ..}"""
+    if not usage:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            LLM_TOKENS.inc(tokens, stage=stage, kind=kind)
+
+
+class MetricsMiddleware:
+    """ASGI中间件：按路由模板统计接口请求数、错误数和耗时（未匹配路由的请求记为unmatched）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            status[0] = 500
+            raise
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=status[0])
+            if status[0] >= 500:
+                HTTP_ERRORS.inc(method=method, endpoint=endpoint)
+            HTTP_DURATION.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
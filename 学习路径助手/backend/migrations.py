@@ -0,0 +1,448 @@
+class Migration:
+    """一个版本的表结构变更，statements按数据库类型（Repository.name）给出依次执行的SQL"""
+
+    def __init__(self, version, description, sqlserver, sqlite):
+        self.version = version
+        self.description = description
+        self.statements = {"sqlserver": sqlserver, "sqlite": sqlite}
+
+
+def _sqlserver_index(name, table, definition, unique=False):
+    return f'''
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+    CREATE {"UNIQUE " if unique else ""}INDEX {name} ON {table} {definition}
+    '''
+
+
+def _sqlserver_drop_index(name, table):
+    return f'''
+    IF EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+    DROP INDEX {name} ON {table}
+    '''
+
+
+# 记录已执行的迁移版本
+SCHEMA_VERSION_DDL = {
+    "sqlserver": '''
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'SCHEMA_VERSION')
+    CREATE TABLE SCHEMA_VERSION (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_time DATETIME DEFAULT GETDATE()
+    )
+    ''',
+    "sqlite": '''
+    CREATE TABLE IF NOT EXISTS SCHEMA_VERSION (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_time TEXT DEFAULT (datetime('now', 'localtime'))
+    )
+    '''
+}
+
+
+MIGRATIONS = [
+    # 版本1为引入迁移之前的完整表结构；语句均可重复执行，已有数据库会被直接登记为版本1
+    Migration(1, "基础表结构", sqlserver=[
+        # 1. 学习路径表
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LEARNING_PATH')
+        CREATE TABLE LEARNING_PATH (
+            path_id INT IDENTITY(1,1) PRIMARY KEY,
+            target VARCHAR(255) NOT NULL,
+            level VARCHAR(50) NOT NULL,
+            pace VARCHAR(50) NOT NULL,
+            resource_type VARCHAR(50) NOT NULL,
+            create_time DATETIME DEFAULT GETDATE(),
+            path_content VARCHAR(MAX)
+        )
+        ''',
+        # 2. 学习模块表
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LEARNING_MODULE')
+        CREATE TABLE LEARNING_MODULE (
+            module_id INT IDENTITY(1,1) PRIMARY KEY,
+            path_id INT,
+            module_name VARCHAR(100) NOT NULL,
+            estimated_hours INT,
+            dependency VARCHAR(100),
+            FOREIGN KEY (path_id) REFERENCES LEARNING_PATH (path_id)
+        )
+        ''',
+        # 3. 学习资源表
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LEARNING_RESOURCE')
+        CREATE TABLE LEARNING_RESOURCE (
+            resource_id INT IDENTITY(1,1) PRIMARY KEY,
+            module_id INT,
+            title VARCHAR(255) NOT NULL,
+            url VARCHAR(512) NOT NULL,
+            source VARCHAR(50),
+            tag VARCHAR(50),
+            type VARCHAR(20),
+            FOREIGN KEY (module_id) REFERENCES LEARNING_MODULE (module_id)
+        )
+        ''',
+        # 4. 练习题表
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'EXERCISE')
+        CREATE TABLE EXERCISE (
+            exercise_id INT IDENTITY(1,1) PRIMARY KEY,
+            module_id INT,
+            question VARCHAR(MAX) NOT NULL,
+            answer VARCHAR(MAX) NOT NULL,
+            analysis VARCHAR(MAX),
+            difficulty INT DEFAULT 1,
+            FOREIGN KEY (module_id) REFERENCES LEARNING_MODULE (module_id)
+        )
+        ''',
+        # 5. 学习进度表
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_PROGRESS')
+        CREATE TABLE USER_PROGRESS (
+            progress_id INT IDENTITY(1,1) PRIMARY KEY,
+            path_id INT,
+            module_name VARCHAR(100) NOT NULL,
+            status VARCHAR(20) DEFAULT '未开始',
+            accuracy FLOAT DEFAULT 0.0,
+            update_time DATETIME DEFAULT GETDATE(),
+            FOREIGN KEY (path_id) REFERENCES LEARNING_PATH (path_id)
+        )
+        ''',
+        # 6. 答题记录表
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_ANSWER')
+        CREATE TABLE USER_ANSWER (
+            answer_id INT IDENTITY(1,1) PRIMARY KEY,
+            path_id INT,
+            module_name VARCHAR(100) NOT NULL,
+            exercise_id INT,
+            user_answer VARCHAR(MAX),
+            is_correct BIT,
+            submit_time DATETIME DEFAULT GETDATE(),
+            FOREIGN KEY (path_id) REFERENCES LEARNING_PATH (path_id)
+        )
+        ''',
+        # 后续版本新增的字段（早期建的表缺这些字段时补上）
+        *[f'''
+        IF COL_LENGTH('{table}', '{column}') IS NULL
+        ALTER TABLE {table} ADD {column} {definition} NULL
+        ''' for table, column, definition in (('LEARNING_MODULE', 'level', 'VARCHAR(50)'),
+                                              ('LEARNING_MODULE', 'learning_goal', 'VARCHAR(MAX)'),
+                                              ('EXERCISE', 'options', 'VARCHAR(MAX)'))],
+        # 7. 模块目录表：同名同水平同资源类型的模块共享一套资源和练习题
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'MODULE_CATALOG')
+        CREATE TABLE MODULE_CATALOG (
+            catalog_id INT IDENTITY(1,1) PRIMARY KEY,
+            catalog_key VARCHAR(255) NOT NULL UNIQUE,
+            module_name VARCHAR(100) NOT NULL,
+            level VARCHAR(50) NOT NULL,
+            resource_type VARCHAR(50) NOT NULL,
+            create_time DATETIME DEFAULT GETDATE()
+        )
+        ''',
+        # 模块、资源、练习题关联到模块目录（早期数据仍按module_id关联）
+        *[f'''
+        IF COL_LENGTH('{table}', 'catalog_id') IS NULL
+        ALTER TABLE {table} ADD catalog_id INT NULL REFERENCES MODULE_CATALOG (catalog_id)
+        ''' for table in ('LEARNING_MODULE', 'LEARNING_RESOURCE', 'EXERCISE')],
+        # 8. 幂等请求记录表：保存Idempotency-Key对应的请求哈希与最终响应
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'IDEMPOTENCY_KEY')
+        CREATE TABLE IDEMPOTENCY_KEY (
+            scope VARCHAR(50) NOT NULL,
+            idem_key VARCHAR(255) NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            response_body NVARCHAR(MAX),
+            create_time DATETIME DEFAULT GETDATE(),
+            update_time DATETIME DEFAULT GETDATE(),
+            PRIMARY KEY (scope, idem_key)
+        )
+        '''
+    ], sqlite=[
+        '''
+        CREATE TABLE IF NOT EXISTS LEARNING_PATH (
+            path_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target TEXT NOT NULL,
+            level TEXT NOT NULL,
+            pace TEXT NOT NULL,
+            resource_type TEXT NOT NULL,
+            create_time TEXT DEFAULT (datetime('now', 'localtime')),
+            path_content TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS MODULE_CATALOG (
+            catalog_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            catalog_key TEXT NOT NULL UNIQUE,
+            module_name TEXT NOT NULL,
+            level TEXT NOT NULL,
+            resource_type TEXT NOT NULL,
+            create_time TEXT DEFAULT (datetime('now', 'localtime'))
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS LEARNING_MODULE (
+            module_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path_id INTEGER REFERENCES LEARNING_PATH (path_id),
+            module_name TEXT NOT NULL,
+            estimated_hours INTEGER,
+            dependency TEXT,
+            level TEXT,
+            learning_goal TEXT,
+            catalog_id INTEGER REFERENCES MODULE_CATALOG (catalog_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS LEARNING_RESOURCE (
+            resource_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            module_id INTEGER REFERENCES LEARNING_MODULE (module_id),
+            title TEXT NOT NULL,
+            url TEXT NOT NULL,
+            source TEXT,
+            tag TEXT,
+            type TEXT,
+            catalog_id INTEGER REFERENCES MODULE_CATALOG (catalog_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS EXERCISE (
+            exercise_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            module_id INTEGER REFERENCES LEARNING_MODULE (module_id),
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            analysis TEXT,
+            difficulty INTEGER DEFAULT 1,
+            options TEXT,
+            catalog_id INTEGER REFERENCES MODULE_CATALOG (catalog_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS USER_PROGRESS (
+            progress_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path_id INTEGER REFERENCES LEARNING_PATH (path_id),
+            module_name TEXT NOT NULL,
+            status TEXT DEFAULT '未开始',
+            accuracy REAL DEFAULT 0.0,
+            update_time TEXT DEFAULT (datetime('now', 'localtime'))
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS USER_ANSWER (
+            answer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path_id INTEGER REFERENCES LEARNING_PATH (path_id),
+            module_name TEXT NOT NULL,
+            exercise_id INTEGER,
+            user_answer TEXT,
+            is_correct INTEGER,
+            submit_time TEXT DEFAULT (datetime('now', 'localtime'))
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS IDEMPOTENCY_KEY (
+            scope TEXT NOT NULL,
+            idem_key TEXT NOT NULL,
+            request_hash TEXT NOT NULL,
+            status TEXT NOT NULL,
+            response_body TEXT,
+            create_time TEXT DEFAULT (datetime('now', 'localtime')),
+            update_time TEXT DEFAULT (datetime('now', 'localtime')),
+            PRIMARY KEY (scope, idem_key)
+        )
+        '''
+    ]),
+
+    # 热点查询的索引：按模块名查模块、按目录/模块查资源和练习题、按路径(+模块+题目)查答题记录和进度
+    # SQL Server用INCLUDE覆盖查询列；SQLite把覆盖列放进索引键（rowid主键自动包含在索引中）
+    Migration(2, "热点查询索引", sqlserver=[
+        _sqlserver_index('IX_LEARNING_MODULE_MODULE_NAME', 'LEARNING_MODULE', '(module_name) INCLUDE (catalog_id)'),
+        _sqlserver_index('IX_LEARNING_MODULE_PATH_ID', 'LEARNING_MODULE', '(path_id)'),
+        _sqlserver_index('IX_LEARNING_RESOURCE_CATALOG_ID', 'LEARNING_RESOURCE',
+                         '(catalog_id, type) INCLUDE (module_id, title, url, source, tag)'),
+        _sqlserver_index('IX_LEARNING_RESOURCE_MODULE_ID', 'LEARNING_RESOURCE', '(module_id, type)'),
+        _sqlserver_index('IX_EXERCISE_CATALOG_ID', 'EXERCISE', '(catalog_id)'),
+        _sqlserver_index('IX_EXERCISE_MODULE_ID', 'EXERCISE', '(module_id)'),
+        _sqlserver_index('IX_USER_ANSWER_PATH_MODULE_EXERCISE', 'USER_ANSWER',
+                         '(path_id, module_name, exercise_id) INCLUDE (is_correct)'),
+        _sqlserver_index('IX_USER_PROGRESS_PATH_MODULE', 'USER_PROGRESS', '(path_id, module_name)')
+    ], sqlite=[
+        'CREATE INDEX IF NOT EXISTS IX_LEARNING_MODULE_MODULE_NAME ON LEARNING_MODULE (module_name, catalog_id)',
+        'CREATE INDEX IF NOT EXISTS IX_LEARNING_MODULE_PATH_ID ON LEARNING_MODULE (path_id)',
+        'CREATE INDEX IF NOT EXISTS IX_LEARNING_RESOURCE_CATALOG_ID ON LEARNING_RESOURCE (catalog_id, type)',
+        'CREATE INDEX IF NOT EXISTS IX_LEARNING_RESOURCE_MODULE_ID ON LEARNING_RESOURCE (module_id, type)',
+        'CREATE INDEX IF NOT EXISTS IX_EXERCISE_CATALOG_ID ON EXERCISE (catalog_id)',
+        'CREATE INDEX IF NOT EXISTS IX_EXERCISE_MODULE_ID ON EXERCISE (module_id)',
+        'CREATE INDEX IF NOT EXISTS IX_USER_ANSWER_PATH_MODULE_EXERCISE '
+        'ON USER_ANSWER (path_id, module_name, exercise_id, is_correct)',
+        'CREATE INDEX IF NOT EXISTS IX_USER_PROGRESS_PATH_MODULE ON USER_PROGRESS (path_id, module_name)'
+    ]),
+
+    # 答题记录和学习进度的唯一约束，供单语句upsert使用；先删除并发提交产生的重复行，只保留最近一条
+    Migration(3, "答题记录与学习进度唯一约束", sqlserver=[
+        '''
+        WITH ranked AS (
+            SELECT ROW_NUMBER() OVER (PARTITION BY path_id, module_name, exercise_id
+                                      ORDER BY submit_time DESC, answer_id DESC) AS rn
+            FROM USER_ANSWER
+        )
+        DELETE FROM ranked WHERE rn > 1
+        ''',
+        '''
+        WITH ranked AS (
+            SELECT ROW_NUMBER() OVER (PARTITION BY path_id, module_name
+                                      ORDER BY update_time DESC, progress_id DESC) AS rn
+            FROM USER_PROGRESS
+        )
+        DELETE FROM ranked WHERE rn > 1
+        ''',
+        _sqlserver_index('UX_USER_ANSWER_PATH_MODULE_EXERCISE', 'USER_ANSWER',
+                         '(path_id, module_name, exercise_id) INCLUDE (is_correct)', unique=True),
+        _sqlserver_drop_index('IX_USER_ANSWER_PATH_MODULE_EXERCISE', 'USER_ANSWER'),
+        _sqlserver_index('UX_USER_PROGRESS_PATH_MODULE', 'USER_PROGRESS', '(path_id, module_name)', unique=True),
+        _sqlserver_drop_index('IX_USER_PROGRESS_PATH_MODULE', 'USER_PROGRESS')
+    ], sqlite=[
+        '''
+        DELETE FROM USER_ANSWER WHERE answer_id IN (
+            SELECT answer_id FROM (
+                SELECT answer_id, ROW_NUMBER() OVER (PARTITION BY path_id, module_name, exercise_id
+                                                     ORDER BY submit_time DESC, answer_id DESC) AS rn
+                FROM USER_ANSWER
+            ) WHERE rn > 1
+        )
+        ''',
+        '''
+        DELETE FROM USER_PROGRESS WHERE progress_id IN (
+            SELECT progress_id FROM (
+                SELECT progress_id, ROW_NUMBER() OVER (PARTITION BY path_id, module_name
+                                                       ORDER BY update_time DESC, progress_id DESC) AS rn
+                FROM USER_PROGRESS
+            ) WHERE rn > 1
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS UX_USER_ANSWER_PATH_MODULE_EXERCISE '
+        'ON USER_ANSWER (path_id, module_name, exercise_id)',
+        'DROP INDEX IF EXISTS IX_USER_ANSWER_PATH_MODULE_EXERCISE',
+        'CREATE UNIQUE INDEX IF NOT EXISTS UX_USER_PROGRESS_PATH_MODULE ON USER_PROGRESS (path_id, module_name)',
+        'DROP INDEX IF EXISTS IX_USER_PROGRESS_PATH_MODULE'
+    ]),
+
+    # 按(路径, 模块)物化的答题数/答对数，读正确率时按主键查询，不再聚合USER_ANSWER
+    # SQL Server由Repository在写答题记录的同一事务内更新（表上有触发器时MERGE不能直接OUTPUT结果）；
+    # SQLite的RETURNING拿不到更新前的值，由触发器维护
+    Migration(4, "答题计数器", sqlserver=[
+        '''
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'ANSWER_STATS')
+        CREATE TABLE ANSWER_STATS (
+            path_id INT NOT NULL,
+            module_name VARCHAR(100) NOT NULL,
+            total INT NOT NULL DEFAULT 0,
+            correct INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (path_id, module_name)
+        )
+        ''',
+        '''
+        INSERT INTO ANSWER_STATS (path_id, module_name, total, correct)
+        SELECT path_id, module_name, COUNT(is_correct), SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END)
+        FROM USER_ANSWER WITH (TABLOCK, HOLDLOCK)
+        WHERE path_id IS NOT NULL
+        GROUP BY path_id, module_name
+        '''
+    ], sqlite=[
+        '''
+        CREATE TABLE IF NOT EXISTS ANSWER_STATS (
+            path_id INTEGER NOT NULL,
+            module_name TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (path_id, module_name)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO ANSWER_STATS (path_id, module_name, total, correct)
+        SELECT path_id, module_name, COUNT(is_correct), SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END)
+        FROM USER_ANSWER
+        WHERE path_id IS NOT NULL
+        GROUP BY path_id, module_name
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS TR_USER_ANSWER_STATS_INSERT AFTER INSERT ON USER_ANSWER
+        WHEN NEW.path_id IS NOT NULL
+        BEGIN
+            INSERT INTO ANSWER_STATS (path_id, module_name, total, correct)
+            VALUES (NEW.path_id, NEW.module_name, NEW.is_correct IS NOT NULL, NEW.is_correct IS 1)
+            ON CONFLICT (path_id, module_name) DO UPDATE SET
+                total = total + excluded.total, correct = correct + excluded.correct;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS TR_USER_ANSWER_STATS_UPDATE
+        AFTER UPDATE OF path_id, module_name, is_correct ON USER_ANSWER
+        WHEN OLD.path_id IS NOT NEW.path_id OR OLD.module_name IS NOT NEW.module_name
+             OR OLD.is_correct IS NOT NEW.is_correct
+        BEGIN
+            UPDATE ANSWER_STATS SET total = total - (OLD.is_correct IS NOT NULL),
+                                    correct = correct - (OLD.is_correct IS 1)
+            WHERE path_id = OLD.path_id AND module_name = OLD.module_name;
+            INSERT INTO ANSWER_STATS (path_id, module_name, total, correct)
+            SELECT NEW.path_id, NEW.module_name, NEW.is_correct IS NOT NULL, NEW.is_correct IS 1
+            WHERE NEW.path_id IS NOT NULL
+            ON CONFLICT (path_id, module_name) DO UPDATE SET
+                total = total + excluded.total, correct = correct + excluded.correct;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS TR_USER_ANSWER_STATS_DELETE AFTER DELETE ON USER_ANSWER
+        BEGIN
+            UPDATE ANSWER_STATS SET total = total - (OLD.is_correct IS NOT NULL),
+                                    correct = correct - (OLD.is_correct IS 1)
+            WHERE path_id = OLD.path_id AND module_name = OLD.module_name;
+        END
+        '''
+    ])
+]
+
+
+def latest_version():
+    return MIGRATIONS[-1].version
+
+
+def applied_versions(repository, cursor):
+    """返回已执行的迁移版本集合（版本表不存在时先创建）"""
+    cursor.execute(SCHEMA_VERSION_DDL[repository.name])
+    cursor.execute('SELECT version FROM SCHEMA_VERSION')
+    return {int(row[0]) for row in cursor.fetchall()}
+
+
+def run_migrations(repository, conn, target_version=None):
+    """把表结构升级到target_version（默认最新版本），返回本次执行的迁移版本列表
+
+    每个迁移在独立事务中执行并登记版本号；事务开始时先加迁移锁并重新检查版本，
+    多个进程同时启动时同一迁移只会执行一次。
+    """
+    target_version = latest_version() if target_version is None else target_version
+    cursor = conn.cursor()
+    try:
+        applied = applied_versions(repository, cursor)
+        conn.commit()
+        executed = []
+        for migration in MIGRATIONS:
+            if migration.version > target_version or migration.version in applied:
+                continue
+            repository.lock_migrations(cursor)
+            if migration.version in applied_versions(repository, cursor):
+                conn.commit()
+                continue
+            for statement in migration.statements[repository.name]:
+                cursor.execute(statement)
+            cursor.execute('INSERT INTO SCHEMA_VERSION (version, description) VALUES (?, ?)',
+                           (migration.version, migration.description))
+            conn.commit()
+            executed.append(migration.version)
+        return executed
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
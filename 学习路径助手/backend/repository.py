@@ -0,0 +1,643 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from migrations import run_migrations
+
+
+class Repository:
+    """数据访问层：封装后端用到的全部SQL，方法接收调用方的游标，事务由调用方提交
+
+    两种数据库语法相同的查询在基类实现，方言差异（取自增id、当前时间、upsert、建表）由子类覆盖。
+    """
+
+    name = None
+    now_sql = None  # 当前时间的SQL表达式
+    health_check_sql = "SELECT 1"
+
+    def connect(self):
+        """新建一个DB-API连接（事务需显式提交）"""
+        raise NotImplementedError
+
+    def migrate(self, conn, target_version=None):
+        """执行未执行过的表结构迁移（见migrations.py），返回本次执行的版本列表"""
+        return run_migrations(self, conn, target_version)
+
+    def lock_migrations(self, cursor):
+        """开启迁移事务并加锁，保证多个进程不会同时执行同一迁移"""
+        raise NotImplementedError
+
+    def insert_rows(self, cursor, table, id_column, columns, rows):
+        """批量插入多行，按rows的顺序返回各行的自增id"""
+        raise NotImplementedError
+
+    def insert_many(self, cursor, table, columns, rows):
+        """批量插入多行，不需要返回id"""
+        raise NotImplementedError
+
+    def insert_row(self, cursor, table, id_column, values):
+        """插入一行（values为{列名: 值}），返回自增id"""
+        return self.insert_rows(cursor, table, id_column, list(values), [list(values.values())])[0]
+
+    # ---------- 模块目录 ----------
+    def load_catalog_entries(self, cursor, keys):
+        """查询模块目录及其已有资源和练习题，返回{catalog_key: {"catalog_id", "resources", "exercises"}}"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        cursor.execute(
+            f'SELECT catalog_id, catalog_key FROM MODULE_CATALOG WHERE catalog_key IN ({",".join("?" * len(keys))})',
+            keys
+        )
+        entries = {row[1]: {"catalog_id": row[0], "resources": [], "exercises": []} for row in cursor.fetchall()}
+        if not entries:
+            return entries
+
+        by_id = {entry["catalog_id"]: entry for entry in entries.values()}
+        id_placeholders = ",".join("?" * len(by_id))
+        cursor.execute(f'''
+        SELECT catalog_id, title, url, source, tag, type FROM LEARNING_RESOURCE
+        WHERE catalog_id IN ({id_placeholders})
+        ''', list(by_id))
+        for row in cursor.fetchall():
+            by_id[row[0]]["resources"].append({
+                "title": row[1], "url": row[2], "source": row[3], "tag": row[4], "type": row[5]
+            })
+
+        cursor.execute(f'''
+        SELECT catalog_id, question, answer, analysis, difficulty, options FROM EXERCISE
+        WHERE catalog_id IN ({id_placeholders})
+        ''', list(by_id))
+        for row in cursor.fetchall():
+            by_id[row[0]]["exercises"].append({
+                "question": row[1], "answer": row[2], "analysis": row[3], "difficulty": row[4], "options": row[5]
+            })
+        return entries
+
+    def lock_catalog(self, cursor, keys):
+        """在当前事务内对这些模块目录条目（catalog_key）加排他锁直到提交或回滚
+
+        写入目录条目的资源/练习题前先加锁再读取已有内容，并发写同一条目的事务依次执行，不会各写一份
+        """
+        raise NotImplementedError
+
+    def create_catalog_entries(self, cursor, entries):
+        """批量创建模块目录条目（已存在则直接复用），entries为[(catalog_key, 模块名, 水平, 资源类型)]，
+        返回{catalog_key: catalog_id}"""
+        raise NotImplementedError
+
+    def load_catalog_entry(self, cursor, catalog_id):
+        """查询单个模块目录条目及其已有资源数和练习题数，返回
+        {"catalog_id", "module_name", "level", "resource_type", "resources_count", "exercises_count"}，不存在返回None"""
+        cursor.execute('''
+        SELECT c.module_name, c.level, c.resource_type,
+               (SELECT COUNT(*) FROM LEARNING_RESOURCE r WHERE r.catalog_id = c.catalog_id),
+               (SELECT COUNT(*) FROM EXERCISE e WHERE e.catalog_id = c.catalog_id)
+        FROM MODULE_CATALOG c WHERE c.catalog_id = ?
+        ''', (catalog_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {"catalog_id": catalog_id, "module_name": row[0], "level": row[1], "resource_type": row[2],
+                "resources_count": row[3], "exercises_count": row[4]}
+
+    def _catalog_ids(self, cursor, keys):
+        cursor.execute(
+            f'SELECT catalog_key, catalog_id FROM MODULE_CATALOG WHERE catalog_key IN ({",".join("?" * len(keys))})',
+            keys
+        )
+        return {row[0]: int(row[1]) for row in cursor.fetchall()}
+
+    # ---------- 学习路径写入 ----------
+    def insert_path(self, cursor, target, level, pace, resource_type, path_content):
+        return self.insert_row(cursor, 'LEARNING_PATH', 'path_id', {
+            "target": target, "level": level, "pace": pace, "resource_type": resource_type,
+            "path_content": path_content
+        })
+
+    def insert_modules(self, cursor, path_id, modules, catalog_ids):
+        """批量插入路径下的模块，catalog_ids与modules一一对应，按顺序返回module_id列表"""
+        return self.insert_rows(
+            cursor, 'LEARNING_MODULE', 'module_id',
+            ["path_id", "module_name", "estimated_hours", "dependency", "level", "learning_goal", "catalog_id"],
+            [[path_id, m["name"], m["duration"], m["dependency"], m["level"], m["goal"], catalog_id]
+             for m, catalog_id in zip(modules, catalog_ids)]
+        )
+
+    def insert_resources(self, cursor, resources):
+        """批量写入资源，resources为[(catalog_id, 资源)]"""
+        self.insert_many(cursor, 'LEARNING_RESOURCE', ["catalog_id", "title", "url", "source", "tag", "type"], [
+            [catalog_id, res["title"], res["url"], res["source"], res["tag"], res["type"]]
+            for catalog_id, res in resources
+        ])
+
+    def insert_exercises(self, cursor, exercises):
+        """批量写入练习题，exercises为[(catalog_id, 练习题)]"""
+        columns = ["catalog_id", "question", "answer", "analysis", "difficulty", "options"]
+        self.insert_many(cursor, 'EXERCISE', columns, [
+            [catalog_id, ex["question"], ex["answer"], ex["analysis"], ex["difficulty"], ex["options"]]
+            for catalog_id, ex in exercises
+        ])
+
+    # ---------- 资源与练习题查询 ----------
+    def find_module(self, cursor, module_name):
+        """按模块名查询，返回(module_id, catalog_id)，不存在返回None"""
+        cursor.execute('SELECT module_id, catalog_id FROM LEARNING_MODULE WHERE module_name = ?', (module_name,))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+    def next_catalog_ids(self, cursor, module_id, limit):
+        """同一路径中排在该模块之后（按生成顺序，即依赖顺序）的最多limit个模块的catalog_id"""
+        cursor.execute('''
+        SELECT catalog_id FROM LEARNING_MODULE
+        WHERE path_id = (SELECT path_id FROM LEARNING_MODULE WHERE module_id = ?)
+          AND module_id > ? AND catalog_id IS NOT NULL
+        ORDER BY module_id
+        ''', (module_id, module_id))
+        return [row[0] for row in cursor.fetchmany(limit)]
+
+    def load_path(self, cursor, path_id):
+        """查询学习路径及其模块（按生成顺序），返回{"path_id", "target", "level", "pace", "resource_type",
+        "path_content", "modules"}，modules为LEARNING_MODULE的行；路径不存在返回None"""
+        cursor.execute(
+            'SELECT target, level, pace, resource_type, path_content FROM LEARNING_PATH WHERE path_id = ?',
+            (path_id,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute('''
+        SELECT module_id, module_name, estimated_hours, dependency, level, learning_goal, catalog_id
+        FROM LEARNING_MODULE WHERE path_id = ? ORDER BY module_id
+        ''', (path_id,))
+        return {"path_id": path_id, "target": row[0], "level": row[1], "pace": row[2], "resource_type": row[3],
+                "path_content": row[4], "modules": self._fetch_dicts(cursor)}
+
+    @staticmethod
+    def _fetch_dicts(cursor):
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def list_resources(self, cursor, module_id, catalog_id, resource_type=None):
+        # 新生成的资源挂在模块目录下，早期数据仍按module_id关联
+        if catalog_id is not None:
+            query = 'SELECT * FROM LEARNING_RESOURCE WHERE catalog_id = ?'
+            params = [catalog_id]
+        else:
+            query = 'SELECT * FROM LEARNING_RESOURCE WHERE module_id = ?'
+            params = [module_id]
+        if resource_type:
+            query += ' AND type = ?'
+            params.append(resource_type)
+        cursor.execute(query, params)
+        return self._fetch_dicts(cursor)
+
+    def list_exercises(self, cursor, module_id, catalog_id):
+        if catalog_id is not None:
+            cursor.execute('SELECT * FROM EXERCISE WHERE catalog_id = ?', (catalog_id,))
+        else:
+            cursor.execute('SELECT * FROM EXERCISE WHERE module_id = ?', (module_id,))
+        return self._fetch_dicts(cursor)
+
+    # ---------- 学习进度与答题 ----------
+    def save_progress(self, cursor, path_id, module_name, status, accuracy):
+        """新增或更新模块学习进度（单语句upsert，依赖(path_id, module_name)唯一约束），返回progress_id"""
+        raise NotImplementedError
+
+    def save_answer(self, cursor, path_id, module_name, exercise_id, user_answer, is_correct):
+        """新增或更新答题记录（单语句upsert，依赖(path_id, module_name, exercise_id)唯一约束），返回answer_id"""
+        raise NotImplementedError
+
+    def save_answers(self, cursor, path_id, module_name, answers):
+        """批量新增或更新同一模块的答题记录，answers为[(exercise_id, user_answer, is_correct)]（题目不重复），
+        按顺序返回answer_id列表"""
+        raise NotImplementedError
+
+    def answer_stats(self, cursor, path_id, module_name=None):
+        """从答题计数器读取答题数和答对数，返回(total, correct)"""
+        if module_name:
+            cursor.execute('SELECT total, correct FROM ANSWER_STATS WHERE path_id = ? AND module_name = ?',
+                           (path_id, module_name))
+        else:
+            cursor.execute('SELECT SUM(total), SUM(correct) FROM ANSWER_STATS WHERE path_id = ?', (path_id,))
+        result = cursor.fetchone()
+        total = result[0] if (result and result[0] is not None) else 0
+        correct = result[1] if (result and result[1] is not None) else 0
+        return total, correct
+
+    # 路径下每个模块一行：模块表提供模块名、层级和顺序（没答过题的模块也列出），答题计数器提供答题数和答对数；
+    # 同名模块在路径中重复出现时只算一次，不在模块表中的答题记录（早期数据）层级和顺序为NULL
+    MODULE_ACCURACY_SQL = '''
+    SELECT module_name, MIN(level) AS level, MIN(position) AS position,
+           SUM(total) AS total, SUM(correct) AS correct
+    FROM (
+        SELECT module_name, level, module_id AS position, 0 AS total, 0 AS correct
+        FROM LEARNING_MODULE WHERE path_id = ?
+        UNION ALL
+        SELECT module_name, NULL, NULL, total, correct
+        FROM ANSWER_STATS WHERE path_id = ?
+    ) AS module_rows
+    GROUP BY module_name
+    '''
+
+    def accuracy_breakdown(self, cursor, path_id):
+        """一次查询统计路径的总体、各层级、各模块答题数和答对数
+
+        返回{"overall": (total, correct), "levels": [(level, total, correct)],
+        "modules": [(module_name, level, total, correct)]}，层级和模块按路径中的顺序排列
+        """
+        cursor.execute(self.MODULE_ACCURACY_SQL, (path_id, path_id))
+        rows = sorted(cursor.fetchall(), key=lambda row: (row[2] is None, row[2] or 0))
+        modules = [(row[0], row[1], int(row[3] or 0), int(row[4] or 0)) for row in rows]
+        levels = {}
+        for _, level, total, correct in modules:
+            if level is not None:
+                level_total, level_correct = levels.get(level, (0, 0))
+                levels[level] = (level_total + total, level_correct + correct)
+        return {
+            "overall": (sum(m[2] for m in modules), sum(m[3] for m in modules)),
+            "levels": [(level, total, correct) for level, (total, correct) in levels.items()],
+            "modules": modules
+        }
+
+    # ---------- 答题计数器维护 ----------
+    # 按USER_ANSWER实时聚合的答题数/答对数，与ANSWER_STATS对照
+    ANSWER_TOTALS_SQL = '''
+    SELECT path_id, module_name, COUNT(is_correct) AS total,
+           SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS correct
+    FROM USER_ANSWER
+    WHERE path_id IS NOT NULL
+    GROUP BY path_id, module_name
+    '''
+
+    def lock_answers(self, cursor):
+        """在当前事务内阻止答题记录写入直到提交，重建计数器期间不会漏算并发提交"""
+        raise NotImplementedError
+
+    def rebuild_answer_stats(self, cursor):
+        """按USER_ANSWER重新计算全部答题计数器，返回写入的行数"""
+        self.lock_answers(cursor)
+        cursor.execute('DELETE FROM ANSWER_STATS')
+        cursor.execute(f'INSERT INTO ANSWER_STATS (path_id, module_name, total, correct) {self.ANSWER_TOTALS_SQL}')
+        return cursor.rowcount
+
+    def verify_answer_stats(self, cursor):
+        """对照USER_ANSWER检查答题计数器，返回不一致的行
+        [(path_id, module_name, 实际total, 实际correct, 计数器total, 计数器correct)]"""
+        cursor.execute(f'''
+        SELECT a.path_id, a.module_name, a.total, a.correct, s.total, s.correct
+        FROM ({self.ANSWER_TOTALS_SQL}) AS a
+        LEFT JOIN ANSWER_STATS s ON s.path_id = a.path_id AND s.module_name = a.module_name
+        WHERE s.path_id IS NULL OR s.total <> a.total OR s.correct <> a.correct
+        UNION ALL
+        SELECT s.path_id, s.module_name, 0, 0, s.total, s.correct
+        FROM ANSWER_STATS s
+        WHERE (s.total <> 0 OR s.correct <> 0)
+          AND NOT EXISTS (SELECT 1 FROM USER_ANSWER ua WHERE ua.path_id = s.path_id AND ua.module_name = s.module_name)
+        ''')
+        return [tuple(row) for row in cursor.fetchall()]
+
+    # ---------- 幂等请求记录 ----------
+    def claim_idempotency_key(self, cursor, scope, key, request_hash, stale_seconds):
+        """登记该key，或接管执行失败/processing超过stale_seconds未更新的记录，成功返回True"""
+        raise NotImplementedError
+
+    def load_idempotency_key(self, cursor, scope, key):
+        """返回(request_hash, status, response_body)，不存在返回None"""
+        cursor.execute('''
+        SELECT request_hash, status, response_body FROM IDEMPOTENCY_KEY WHERE scope = ? AND idem_key = ?
+        ''', (scope, key))
+        row = cursor.fetchone()
+        return tuple(row) if row else None
+
+    def finish_idempotency_key(self, cursor, scope, key, status, response_body):
+        cursor.execute(f'''
+        UPDATE IDEMPOTENCY_KEY SET status = ?, response_body = ?, update_time = {self.now_sql}
+        WHERE scope = ? AND idem_key = ?
+        ''', (status, response_body, scope, key))
+
+
+class SQLServerRepository(Repository):
+    """SQL Server实现（pyodbc，Windows身份验证）"""
+
+    name = "sqlserver"
+    now_sql = "GETDATE()"
+
+    def __init__(self, driver, server, database):
+        self.driver = driver
+        self.server = server
+        self.database = database
+
+    def connect(self):
+        import pyodbc  # 仅SQL Server部署需要安装pyodbc和ODBC驱动
+        return pyodbc.connect(
+            f"DRIVER={self.driver};"
+            f"SERVER={self.server};"
+            f"DATABASE={self.database};"
+            f"Trusted_Connection=yes;"  # Windows身份验证的关键配置
+        )
+
+    # 单条语句最多2100个参数，VALUES最多1000行
+    MAX_PARAMS = 2000
+    MAX_ROWS = 1000
+
+    def _chunks(self, rows, width):
+        size = max(1, min(self.MAX_ROWS, self.MAX_PARAMS // width))
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    def insert_rows(self, cursor, table, id_column, columns, rows):
+        # OUTPUT INSERTED返回本语句插入的id（IDENT_CURRENT会读到其他会话的插入）；
+        # 多行INSERT的OUTPUT顺序不保证与VALUES一致，用MERGE带出源行序号来对应
+        column_list = ", ".join(columns)
+        ids = []
+        for chunk in self._chunks(rows, len(columns) + 1):
+            if len(chunk) == 1:
+                cursor.execute(f'''
+                INSERT INTO {table} ({column_list}) OUTPUT INSERTED.{id_column}
+                VALUES ({", ".join("?" * len(columns))})
+                ''', chunk[0])
+                ids.append(int(cursor.fetchone()[0]))
+                continue
+
+            row_placeholders = "(" + ", ".join("?" * (len(columns) + 1)) + ")"
+            cursor.execute(f'''
+            MERGE {table} AS target
+            USING (VALUES {", ".join([row_placeholders] * len(chunk))}) AS source (ordinal, {column_list})
+            ON 1 = 0
+            WHEN NOT MATCHED THEN
+                INSERT ({column_list}) VALUES ({", ".join("source." + column for column in columns)})
+            OUTPUT source.ordinal, INSERTED.{id_column};
+            ''', [value for ordinal, row in enumerate(chunk) for value in (ordinal, *row)])
+            by_ordinal = {row[0]: int(row[1]) for row in cursor.fetchall()}
+            if len(by_ordinal) != len(chunk):
+                raise Exception(f"批量插入{table}后返回的id数量不符")
+            ids.extend(by_ordinal[ordinal] for ordinal in range(len(chunk)))
+        return ids
+
+    def insert_many(self, cursor, table, columns, rows):
+        row_placeholders = "(" + ", ".join("?" * len(columns)) + ")"
+        for chunk in self._chunks(rows, len(columns)):
+            cursor.execute(f'''
+            INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join([row_placeholders] * len(chunk))}
+            ''', [value for row in chunk for value in row])
+
+    def create_catalog_entries(self, cursor, entries):
+        if not entries:
+            return {}
+        for chunk in self._chunks(entries, 4):
+            cursor.execute(f'''
+            MERGE MODULE_CATALOG WITH (HOLDLOCK) AS target
+            USING (VALUES {", ".join(["(?, ?, ?, ?)"] * len(chunk))})
+                AS source (catalog_key, module_name, level, resource_type)
+            ON target.catalog_key = source.catalog_key
+            WHEN NOT MATCHED THEN
+                INSERT (catalog_key, module_name, level, resource_type)
+                VALUES (source.catalog_key, source.module_name, source.level, source.resource_type);
+            ''', [value for entry in chunk for value in entry])
+        return self._catalog_ids(cursor, [entry[0] for entry in entries])
+
+    # MERGE加HOLDLOCK：键不存在时锁住键范围，并发提交同一题不会都走到INSERT
+    def save_progress(self, cursor, path_id, module_name, status, accuracy):
+        cursor.execute('''
+        MERGE USER_PROGRESS WITH (HOLDLOCK) AS target
+        USING (VALUES (?, ?, ?, ?)) AS source (path_id, module_name, status, accuracy)
+        ON target.path_id = source.path_id AND target.module_name = source.module_name
+        WHEN MATCHED THEN
+            UPDATE SET status = source.status, accuracy = source.accuracy, update_time = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (path_id, module_name, status, accuracy)
+            VALUES (source.path_id, source.module_name, source.status, source.accuracy)
+        OUTPUT INSERTED.progress_id;
+        ''', (path_id, module_name, status, accuracy))
+        return int(cursor.fetchone()[0])
+
+    def save_answer(self, cursor, path_id, module_name, exercise_id, user_answer, is_correct):
+        return self.save_answers(cursor, path_id, module_name, [(exercise_id, user_answer, is_correct)])[0]
+
+    def save_answers(self, cursor, path_id, module_name, answers):
+        # 答题记录和计数器在同一批语句中写入，每批一次往返：MERGE的OUTPUT存入表变量，
+        # 由$action和更新前后的is_correct算出计数器增量（增量为0时不写计数器），最后按源行序号返回answer_id
+        ids = []
+        for chunk in self._chunks(answers, 4):
+            cursor.execute(f'''
+            SET NOCOUNT ON;
+            DECLARE @changes TABLE (ordinal INT, answer_id INT, merge_action NVARCHAR(10), old_correct BIT, new_correct BIT);
+
+            MERGE USER_ANSWER WITH (HOLDLOCK) AS target
+            USING (VALUES {", ".join(["(?, ?, ?, ?)"] * len(chunk))})
+                AS source (ordinal, exercise_id, user_answer, is_correct)
+            ON target.path_id = ? AND target.module_name = ? AND target.exercise_id = source.exercise_id
+            WHEN MATCHED THEN
+                UPDATE SET user_answer = source.user_answer, is_correct = source.is_correct, submit_time = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (path_id, module_name, exercise_id, user_answer, is_correct)
+                VALUES (?, ?, source.exercise_id, source.user_answer, source.is_correct)
+            OUTPUT source.ordinal, INSERTED.answer_id, $action, DELETED.is_correct, source.is_correct INTO @changes;
+
+            MERGE ANSWER_STATS WITH (HOLDLOCK) AS target
+            USING (
+                SELECT path_id, module_name, total, correct
+                FROM (
+                    SELECT ? AS path_id, ? AS module_name,
+                           SUM(CASE WHEN new_correct IS NOT NULL THEN 1 ELSE 0 END
+                               - CASE WHEN merge_action = 'UPDATE' AND old_correct IS NOT NULL THEN 1 ELSE 0 END) AS total,
+                           SUM(CASE WHEN new_correct = 1 THEN 1 ELSE 0 END
+                               - CASE WHEN merge_action = 'UPDATE' AND old_correct = 1 THEN 1 ELSE 0 END) AS correct
+                    FROM @changes
+                ) AS delta
+                WHERE total <> 0 OR correct <> 0
+            ) AS source
+            ON target.path_id = source.path_id AND target.module_name = source.module_name
+            WHEN MATCHED THEN
+                UPDATE SET total = target.total + source.total, correct = target.correct + source.correct
+            WHEN NOT MATCHED THEN
+                INSERT (path_id, module_name, total, correct)
+                VALUES (source.path_id, source.module_name, source.total, source.correct);
+
+            SELECT ordinal, answer_id FROM @changes;
+            ''', [value for ordinal, answer in enumerate(chunk) for value in (ordinal, *answer)]
+                + [path_id, module_name, path_id, module_name, path_id, module_name])
+            by_ordinal = {row[0]: int(row[1]) for row in cursor.fetchall()}
+            ids.extend(by_ordinal[ordinal] for ordinal in range(len(chunk)))
+        return ids
+
+    def lock_answers(self, cursor):
+        # 共享表锁等待进行中的答题事务（含其计数器更新）提交，并阻止新的写入直到本事务结束
+        cursor.execute('SELECT TOP 1 answer_id FROM USER_ANSWER WITH (TABLOCK, HOLDLOCK)')
+        cursor.fetchall()
+
+    def accuracy_breakdown(self, cursor, path_id):
+        # GROUPING SETS一次算出模块、层级和总体三种粒度的汇总行
+        cursor.execute(f'''
+        SELECT GROUPING(level) AS level_rollup, GROUPING(module_name) AS module_rollup,
+               level, module_name, MIN(position), SUM(total), SUM(correct)
+        FROM ({self.MODULE_ACCURACY_SQL}) AS module_totals
+        GROUP BY GROUPING SETS ((), (level), (level, module_name))
+        ORDER BY CASE WHEN MIN(position) IS NULL THEN 1 ELSE 0 END, MIN(position), GROUPING(module_name)
+        ''', (path_id, path_id))
+        result = {"overall": (0, 0), "levels": [], "modules": []}
+        for level_rollup, module_rollup, level, module_name, _, total, correct in cursor.fetchall():
+            totals = (int(total or 0), int(correct or 0))
+            if level_rollup:
+                result["overall"] = totals
+            elif module_rollup:
+                if level is not None:
+                    result["levels"].append((level, *totals))
+            else:
+                result["modules"].append((module_name, level, *totals))
+        return result
+
+    def claim_idempotency_key(self, cursor, scope, key, request_hash, stale_seconds):
+        cursor.execute('''
+        INSERT INTO IDEMPOTENCY_KEY (scope, idem_key, request_hash, status)
+        SELECT ?, ?, ?, 'processing'
+        WHERE NOT EXISTS (
+            SELECT 1 FROM IDEMPOTENCY_KEY WITH (UPDLOCK, HOLDLOCK) WHERE scope = ? AND idem_key = ?
+        )
+        ''', (scope, key, request_hash, scope, key))
+        if cursor.rowcount == 1:
+            return True
+        # 上次执行失败，或processing记录已过期（原进程崩溃），由本次请求接管
+        cursor.execute('''
+        UPDATE IDEMPOTENCY_KEY SET status = 'processing', update_time = GETDATE()
+        WHERE scope = ? AND idem_key = ? AND request_hash = ?
+          AND (status = 'failed'
+               OR (status = 'processing' AND update_time < DATEADD(second, -?, GETDATE())))
+        ''', (scope, key, request_hash, stale_seconds))
+        return cursor.rowcount == 1
+
+    def lock_catalog(self, cursor, keys):
+        # 按条目加应用锁（条目可能还不存在，无法锁行），资源名用键的哈希控制在255字符内；排序加锁避免死锁
+        resources = sorted({"LEARNPATH_CATALOG:" + hashlib.sha1(key.encode("utf-8")).hexdigest() for key in keys})
+        self._get_applocks(cursor, resources, timeout_ms=30000)
+
+    def lock_migrations(self, cursor):
+        self._get_applocks(cursor, ["LEARNPATH_SCHEMA_MIGRATION"], timeout_ms=60000)
+
+    def _get_applocks(self, cursor, resources, timeout_ms):
+        # 事务拥有的应用锁需要已开启的事务（手动提交模式下EXEC不会开启隐式事务），因此先显式开启；
+        # sp_getapplock以返回值报告超时(-1)、死锁(-3)等失败而不报错，返回值小于0时THROW，由调用方回滚
+        for chunk in self._chunks(resources, 1):
+            cursor.execute('''
+            SET NOCOUNT ON;
+            IF @@TRANCOUNT = 0 BEGIN TRANSACTION;
+            DECLARE @result INT;
+            ''' + "".join(f'''
+            EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction',
+                @LockTimeout = {int(timeout_ms)};
+            IF @result < 0 THROW 50000, N'应用锁获取失败', 1;
+            ''' for _ in chunk), chunk)
+
+
+class SQLiteRepository(Repository):
+    """SQLite实现（WAL模式），用于单机部署、压测和Linux上的CI，首次连接时自动执行表结构迁移"""
+
+    name = "sqlite"
+    now_sql = "datetime('now', 'localtime')"
+
+    def __init__(self, path, auto_migrate=True):
+        self.path = path
+        self._schema_lock = threading.Lock()
+        self._schema_ready = not auto_migrate
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self.migrate(conn)
+                    self._schema_ready = True
+        return conn
+
+    # SQLite在进程内执行，逐行插入没有网络往返，直接用lastrowid取id
+    def insert_rows(self, cursor, table, id_column, columns, rows):
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        ids = []
+        for row in rows:
+            cursor.execute(sql, row)
+            ids.append(cursor.lastrowid)
+        return ids
+
+    def insert_many(self, cursor, table, columns, rows):
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})', rows
+            )
+
+    def create_catalog_entries(self, cursor, entries):
+        if not entries:
+            return {}
+        cursor.executemany('''
+        INSERT OR IGNORE INTO MODULE_CATALOG (catalog_key, module_name, level, resource_type) VALUES (?, ?, ?, ?)
+        ''', entries)
+        return self._catalog_ids(cursor, [entry[0] for entry in entries])
+
+    # INSERT ... ON CONFLICT ... RETURNING需要SQLite 3.35+；答题计数器由USER_ANSWER上的触发器维护（见migrations.py）
+    def save_progress(self, cursor, path_id, module_name, status, accuracy):
+        cursor.execute('''
+        INSERT INTO USER_PROGRESS (path_id, module_name, status, accuracy) VALUES (?, ?, ?, ?)
+        ON CONFLICT (path_id, module_name) DO UPDATE SET
+            status = excluded.status, accuracy = excluded.accuracy, update_time = datetime('now', 'localtime')
+        RETURNING progress_id
+        ''', (path_id, module_name, status, accuracy))
+        return cursor.fetchone()[0]
+
+    def save_answer(self, cursor, path_id, module_name, exercise_id, user_answer, is_correct):
+        cursor.execute('''
+        INSERT INTO USER_ANSWER (path_id, module_name, exercise_id, user_answer, is_correct) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (path_id, module_name, exercise_id) DO UPDATE SET
+            user_answer = excluded.user_answer, is_correct = excluded.is_correct,
+            submit_time = datetime('now', 'localtime')
+        RETURNING answer_id
+        ''', (path_id, module_name, exercise_id, user_answer, is_correct))
+        return cursor.fetchone()[0]
+
+    def lock_answers(self, cursor):
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def lock_catalog(self, cursor, keys):
+        # SQLite只有库级写锁：立即开启写事务，之后的读取看到的是其他写事务提交后的数据
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def save_answers(self, cursor, path_id, module_name, answers):
+        # 与insert_rows相同，进程内逐条执行没有网络往返
+        return [self.save_answer(cursor, path_id, module_name, *answer) for answer in answers]
+
+    def claim_idempotency_key(self, cursor, scope, key, request_hash, stale_seconds):
+        cursor.execute('''
+        INSERT OR IGNORE INTO IDEMPOTENCY_KEY (scope, idem_key, request_hash, status) VALUES (?, ?, ?, 'processing')
+        ''', (scope, key, request_hash))
+        if cursor.rowcount == 1:
+            return True
+        cursor.execute('''
+        UPDATE IDEMPOTENCY_KEY SET status = 'processing', update_time = datetime('now', 'localtime')
+        WHERE scope = ? AND idem_key = ? AND request_hash = ?
+          AND (status = 'failed'
+               OR (status = 'processing' AND update_time < datetime('now', 'localtime', ?)))
+        ''', (scope, key, request_hash, f"-{int(stale_seconds)} seconds"))
+        return cursor.rowcount == 1
+
+    def lock_migrations(self, cursor):
+        cursor.execute("BEGIN IMMEDIATE")
+
+
+def create_repository():
+    """按环境变量DB_BACKEND创建数据访问层：sqlserver（默认）或sqlite"""
+    backend = os.getenv("DB_BACKEND", "sqlserver").lower()
+    if backend == "sqlite":
+        return SQLiteRepository(os.getenv(
+            "SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "learnpath.db")
+        ))
+    if backend == "sqlserver":
+        return SQLServerRepository(
+            driver=os.getenv('SQL_SERVER_DRIVER'),
+            server=os.getenv('SQL_SERVER_SERVER'),
+            database=os.getenv('SQL_SERVER_DATABASE')
+        )
+    raise ValueError(f"未知的DB_BACKEND：{backend}")
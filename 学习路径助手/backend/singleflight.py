@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class SingleFlight:
+    """合并并发的相同请求，只执行一次并把结果共享给所有等待者
+
+    同一进程内（同一个事件循环）通过共享Future合并；同一台机器上的多个uvicorn进程通过本地SQLite文件中的
+    租约表（谁在执行）和结果表（执行结果）协调，SQLite读写在线程中执行，不阻塞事件循环。
+    跨进程共享的结果必须可JSON序列化。
+    """
+
+    def __init__(self, path, lease_seconds=600, result_ttl=60, poll_interval=0.2):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._flights = {}
+        self._db_lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS INFLIGHT_LEASE (
+            flight_key TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expire_time REAL NOT NULL
+        )
+        ''')
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS INFLIGHT_RESULT (
+            flight_key TEXT PRIMARY KEY,
+            result TEXT,
+            error TEXT,
+            finish_time REAL NOT NULL
+        )
+        ''')
+        self._conn.commit()
+
+    async def do(self, key, fn, on_wait=None):
+        """执行协程函数fn并返回结果；已有相同key的请求在执行时等待其结果。on_wait()在需要等待时回调"""
+        while key in self._flights:
+            future = self._flights[key]
+            if on_wait:
+                on_wait()
+                on_wait = None
+            try:
+                # shield：等待者被取消时不影响正在执行的请求
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # 正在执行的请求被取消（如客户端断开），由等待者重新执行
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        try:
+            result = await self._run_across_processes(key, fn, on_wait)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免事件循环报告"Future exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._flights[key]
+
+    async def _run_across_processes(self, key, fn, on_wait):
+        while True:
+            since = time.time()
+            if await asyncio.to_thread(self._acquire_lease, key):
+                try:
+                    result = await fn()
+                except asyncio.CancelledError:
+                    # 被取消时只释放租约，其他进程的等待者重新争抢执行
+                    await asyncio.shield(asyncio.to_thread(self._release_lease, key))
+                    raise
+                except Exception as e:
+                    await asyncio.to_thread(self._publish, key, error=str(e) or type(e).__name__)
+                    raise
+                await asyncio.to_thread(self._publish, key, result=result)
+                return result
+
+            # 其他进程正在执行：等待其发布结果；租约消失却没有结果（进程崩溃）时重新争抢
+            if on_wait:
+                on_wait()
+                on_wait = None
+            published = await self._wait_for_result(key, since)
+            if published is not None:
+                result, error = published
+                if error is not None:
+                    raise Exception(error)
+                return result
+
+    def _acquire_lease(self, key):
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute('DELETE FROM INFLIGHT_LEASE WHERE flight_key = ? AND expire_time < ?', (key, now))
+            cursor = self._conn.execute('''
+            INSERT OR IGNORE INTO INFLIGHT_LEASE (flight_key, owner, expire_time) VALUES (?, ?, ?)
+            ''', (key, self.owner, now + self.lease_seconds))
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def _release_lease(self, key):
+        with self._db_lock:
+            self._conn.execute('DELETE FROM INFLIGHT_LEASE WHERE flight_key = ? AND owner = ?', (key, self.owner))
+            self._conn.commit()
+
+    def _publish(self, key, result=None, error=None):
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute('''
+            INSERT OR REPLACE INTO INFLIGHT_RESULT (flight_key, result, error, finish_time) VALUES (?, ?, ?, ?)
+            ''', (key, None if error is not None else json.dumps(result, ensure_ascii=False), error, now))
+            self._conn.execute('DELETE FROM INFLIGHT_LEASE WHERE flight_key = ? AND owner = ?', (key, self.owner))
+            self._conn.execute('DELETE FROM INFLIGHT_RESULT WHERE finish_time < ?', (now - self.result_ttl,))
+            self._conn.commit()
+
+    async def _wait_for_result(self, key, since):
+        """轮询结果表，返回(result, error)；租约已释放或过期但没有新结果时返回None"""
+        while True:
+            lease, row = await asyncio.to_thread(self._read_flight, key, since)
+            if row:
+                return (json.loads(row[0]) if row[0] is not None else None), row[1]
+            if not lease or lease[0] < time.time():
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    def _read_flight(self, key, since):
+        # 先读租约再读结果：发布结果与释放租约在同一事务中，这样不会漏掉刚发布的结果
+        with self._db_lock:
+            lease = self._conn.execute(
+                'SELECT expire_time FROM INFLIGHT_LEASE WHERE flight_key = ?', (key,)
+            ).fetchone()
+            row = self._conn.execute('''
+            SELECT result, error FROM INFLIGHT_RESULT WHERE flight_key = ? AND finish_time >= ?
+            ''', (key, since)).fetchone()
+        return lease, row
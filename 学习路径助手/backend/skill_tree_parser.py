@@ -0,0 +1,101 @@
+import re
+
+# 层级标题，如“# 🟢 初级（基础入门）”
+LEVEL_HEADER_PATTERN = re.compile(r'#+\s*[🟢🟡🔴]?\s*(初级|中级|高级)')
+# 任意以emoji开头的一级结构标题（无法识别层级名时结束当前层级）
+SECTION_HEADER_PATTERN = re.compile(r'#+\s*[🟢🟡🔴]')
+# 模块标题，如“## 1. HTML基础”
+MODULE_HEADER_PATTERN = re.compile(r'##+\s*\d+\.\s*(.+)')
+
+# 模块字段：(字段名, 关键字, 正则, 默认值)，先用关键字做子串过滤再跑正则
+FIELD_PATTERNS = (
+    ("duration", "预计学习时长：", re.compile(r'预计学习时长：(\d+)小时'), "8"),
+    ("dependency", "前置依赖：", re.compile(r'前置依赖：(.+)'), "无"),
+    ("points", "核心技能点：", re.compile(r'核心技能点：(.+)'), ""),
+    ("goal", "学习目标：", re.compile(r'学习目标：(.+)'), "")
+)
+
+
+class SkillTreeParser:
+    """逐行状态机解析分层级技能树Markdown
+
+    支持分块喂入（如LLM流式输出），模块在下一个模块/层级标题到达或close()时完整产出。
+    对按提示词格式输出的文本，结果与原正则实现一致（见bench/bench_parser.py的黄金语料）；
+    不同的是不带emoji的层级标题也会开启新层级，原实现会把其后的模块并入上一层级。
+    """
+
+    def __init__(self):
+        self._pending = ""  # 尚未遇到换行符的半行文本
+        self._level = None
+        self._module = None
+
+    def feed(self, chunk):
+        """喂入一段文本，返回本次新完成的模块列表"""
+        self._pending += chunk
+        if "\n" not in chunk:
+            return []
+
+        *lines, self._pending = self._pending.split("\n")
+        completed = []
+        for line in lines:
+            self._feed_line(line, completed)
+        return completed
+
+    def close(self):
+        """输入结束，返回剩余的模块列表"""
+        completed = []
+        if self._pending:
+            self._feed_line(self._pending, completed)
+            self._pending = ""
+        self._finish_module(completed)
+        return completed
+
+    def _feed_line(self, line, completed):
+        line = line.strip()
+        if line.startswith("#"):
+            module_match = MODULE_HEADER_PATTERN.match(line)
+            if module_match:
+                self._finish_module(completed)
+                if self._level:
+                    self._module = {"name": module_match.group(1).strip(), "level": self._level}
+                return
+
+            level_match = LEVEL_HEADER_PATTERN.match(line)
+            if level_match:
+                self._finish_module(completed)
+                self._level = level_match.group(1)
+                return
+
+            if SECTION_HEADER_PATTERN.match(line):
+                self._finish_module(completed)
+                self._level = None
+                return
+
+        if self._module is None or "：" not in line:
+            return
+        for field, keyword, pattern, _ in FIELD_PATTERNS:
+            if keyword in line and field not in self._module:
+                match = pattern.search(line)
+                if match:
+                    self._module[field] = match.group(1).strip()
+
+    def _finish_module(self, completed):
+        if self._module is None:
+            return
+        module = self._module
+        self._module = None
+        fields = {field: module.get(field, default) for field, _, _, default in FIELD_PATTERNS}
+        completed.append({
+            "name": module["name"],
+            "duration": fields["duration"],
+            "dependency": fields["dependency"],
+            "points": fields["points"],
+            "level": module["level"],
+            "goal": fields["goal"]
+        })
+
+
+def parse_learning_modules(path_content):
+    """解析DeepSeek返回的Markdown格式分层级技能树，提取模块信息"""
+    parser = SkillTreeParser()
+    return parser.feed(path_content) + parser.close()
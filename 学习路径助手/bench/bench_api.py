@@ -0,0 +1,256 @@
+"""后端接口端到端压测：按配置的并发依次驱动生成路径、获取练习题、提交答题、正确率统计，输出JSON报告
+
+先启动模拟LLM服务（bench/mock_llm_server.py）并让后端通过API_BASE_URL接入，或以LLM_PROVIDER=mock启动后端。
+--background-generations N时额外对比读接口在空闲和N个生成请求进行中两种情况下的延迟，
+此时模拟LLM的延迟应足够长（如MOCK_LLM_LATENCY_MS=3000），使读取期间生成请求一直在进行。
+
+用法：python bench/bench_api.py [--base-url http://127.0.0.1:8000] [--concurrency 8] [--paths 16]
+                                [--answers-per-path 8] [--background-generations 0] [--output report.json]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """记录单个接口的延迟和失败次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+
+    def call(self, session, method, url, **kwargs):
+        start = time.perf_counter()
+        response, error = self.request(session, method, url, **kwargs)
+        self.record(time.perf_counter() - start, error)
+        return response
+
+    @staticmethod
+    def request(session, method, url, **kwargs):
+        """发出请求但不记录，返回(response, error)，失败时response为None"""
+        try:
+            response = session.request(method, url, **kwargs)
+            error = None if response.ok else f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            response, error = None, type(e).__name__
+        return (response if error is None else None), error
+
+    def record(self, elapsed, error=None):
+        with self._lock:
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+            else:
+                self.latencies.append(elapsed)
+
+    def report(self, wall_seconds):
+        latencies = sorted(self.latencies)
+        to_ms = lambda value: None if value is None else round(value * 1000, 2)
+        return {
+            "requests": len(latencies) + sum(self.errors.values()),
+            "ok": len(latencies),
+            "errors": self.errors,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+            "latency_ms": {
+                "mean": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+                "p50": to_ms(percentile(latencies, 50)),
+                "p95": to_ms(percentile(latencies, 95)),
+                "p99": to_ms(percentile(latencies, 99)),
+                "max": to_ms(latencies[-1] if latencies else None)
+            }
+        }
+
+
+def run_stage(name, tasks, concurrency, report):
+    """以给定并发执行一组任务，统计该阶段的耗时并写入报告"""
+    recorder = Recorder()
+    local = threading.local()
+
+    def run(task):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return task(local.session, recorder)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run, tasks))
+    report[name] = recorder.report(time.perf_counter() - start)
+    print(f"{name}: {report[name]['ok']}/{report[name]['requests']} 成功，"
+          f"p50={report[name]['latency_ms']['p50']}ms p95={report[name]['latency_ms']['p95']}ms")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--paths", type=int, default=16, help="生成的学习路径数")
+    arg_parser.add_argument("--distinct-targets", type=int, default=None,
+                            help="不同学习目标的个数（默认与--paths相同，小于它时可测缓存/合并效果）")
+    arg_parser.add_argument("--answers-per-path", type=int, default=8, help="每条路径提交的答题数")
+    arg_parser.add_argument("--bypass-cache", action="store_true", help="生成路径时跳过LLM缓存")
+    arg_parser.add_argument("--background-generations", type=int, default=0,
+                            help="读接口延迟对比阶段中同时进行的生成请求数（0为跳过该阶段）")
+    arg_parser.add_argument("--read-requests", type=int, default=200, help="读接口延迟对比阶段每种情况的请求数")
+    arg_parser.add_argument("--timeout", type=float, default=300)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="报告另存为JSON文件")
+    args = arg_parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    run_id = uuid.uuid4().hex[:6]
+    distinct = args.distinct_targets or args.paths
+    rng = random.Random(args.seed)
+    report = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "run_id": run_id}
+
+    def generate_task(index):
+        def task(session, recorder):
+            response = recorder.call(session, "POST", f"{base_url}/api/generate-path", timeout=args.timeout, json={
+                "target": f"压测{run_id}-{index % distinct}",
+                "level": "零基础",
+                "pace": "紧凑",
+                "resource_type": "视频+文档",
+                "bypass_cache": args.bypass_cache
+            })
+            return response.json()["data"] if response is not None else None
+        return task
+
+    start = time.perf_counter()
+    paths = [p for p in run_stage("generate_path", [generate_task(i) for i in range(args.paths)],
+                                  args.concurrency, report) if p]
+    module_names = sorted({m["module_name"] for p in paths for m in p["modules"]})
+
+    def exercises_task(module_name):
+        def task(session, recorder):
+            response = recorder.call(session, "GET", f"{base_url}/api/get-exercises", timeout=args.timeout,
+                                     params={"module_name": module_name})
+            return module_name, response.json()["data"] if response is not None else []
+        return task
+
+    exercises = dict(run_stage("get_exercises", [exercises_task(n) for n in module_names],
+                               args.concurrency, report))
+
+    # 读接口在生成进行中是否变慢：先空闲时读取，再在N个生成请求（目标各不相同且跳过LLM缓存）进行中读取同样多次
+    if args.background_generations and module_names:
+        read_tasks = [exercises_task(module_names[i % len(module_names)]) for i in range(args.read_requests)]
+        run_stage("get_exercises_idle", read_tasks, args.concurrency, report)
+
+        background = Recorder()
+
+        def background_generate(index):
+            session = requests.Session()
+            background.call(session, "POST", f"{base_url}/api/generate-path", timeout=args.timeout, json={
+                "target": f"压测{run_id}-后台{index}",
+                "level": "零基础",
+                "pace": "紧凑",
+                "resource_type": "视频+文档",
+                "bypass_cache": True
+            })
+
+        background_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.background_generations) as executor:
+            futures = [executor.submit(background_generate, i) for i in range(args.background_generations)]
+            time.sleep(1)  # 等生成请求都进入LLM调用
+            run_stage("get_exercises_during_generation", read_tasks, args.concurrency, report)
+            # 读取结束时仍未完成的生成请求数，小于--background-generations时说明对比不充分
+            report["get_exercises_during_generation"]["generations_in_flight_at_end"] = sum(
+                not future.done() for future in futures
+            )
+        report["background_generate_path"] = background.report(time.perf_counter() - background_start)
+
+    def answer_task(path_id, module_name, exercise):
+        def task(session, recorder):
+            options = exercise.get("options") or [exercise["answer"]]
+            user_answer = rng.choice(options)
+            recorder.call(session, "POST", f"{base_url}/api/submit-answer", timeout=args.timeout, json={
+                "path_id": path_id,
+                "module_name": module_name,
+                "exercise_id": exercise["exercise_id"],
+                "user_answer": user_answer,
+                "is_correct": user_answer == exercise["answer"]
+            })
+        return task
+
+    answer_tasks = []
+    for p in paths:
+        candidates = [(m["module_name"], ex) for m in p["modules"] for ex in exercises.get(m["module_name"], [])]
+        for module_name, exercise in rng.sample(candidates, min(args.answers_per_path, len(candidates))):
+            answer_tasks.append(answer_task(p["path_id"], module_name, exercise))
+    run_stage("submit_answer", answer_tasks, args.concurrency, report)
+
+    def answer_sheet_task(path_id, module_name, module_exercises):
+        def task(session, recorder):
+            answers = []
+            for exercise in module_exercises:
+                user_answer = rng.choice(exercise.get("options") or [exercise["answer"]])
+                answers.append({"exercise_id": exercise["exercise_id"], "user_answer": user_answer,
+                                "is_correct": user_answer == exercise["answer"]})
+            recorder.call(session, "POST", f"{base_url}/api/submit-answers", timeout=args.timeout, json={
+                "path_id": path_id, "module_name": module_name, "answers": answers
+            })
+        return task
+
+    # 整张答题卡一次提交（每条路径每个模块一个请求），与上面的逐题提交对比
+    run_stage("submit_answers", [answer_sheet_task(p["path_id"], m["module_name"], exercises[m["module_name"]])
+                                 for p in paths for m in p["modules"] if exercises.get(m["module_name"])],
+              args.concurrency, report)
+
+    def accuracy_task(path_id):
+        def task(session, recorder):
+            recorder.call(session, "POST", f"{base_url}/api/get-accuracy", timeout=args.timeout,
+                          json={"path_id": path_id})
+        return task
+
+    run_stage("get_accuracy", [accuracy_task(p["path_id"]) for p in paths], args.concurrency, report)
+
+    # 正确率统计页：原做法先取总体再逐模块调用get-accuracy（N+1次请求），新接口一次返回全部，按整页耗时对比
+    def accuracy_page_loop_task(path):
+        def task(session, recorder):
+            start = time.perf_counter()
+            error = None
+            for module_name in [None] + [m["module_name"] for m in path["modules"]]:
+                payload = {"path_id": path["path_id"]}
+                if module_name:
+                    payload["module_name"] = module_name
+                _, error = recorder.request(session, "POST", f"{base_url}/api/get-accuracy", timeout=args.timeout,
+                                            json=payload)
+                if error:
+                    break
+            recorder.record(time.perf_counter() - start, error)
+        return task
+
+    def accuracy_breakdown_task(path_id):
+        def task(session, recorder):
+            recorder.call(session, "POST", f"{base_url}/api/get-accuracy-breakdown", timeout=args.timeout,
+                          json={"path_id": path_id})
+        return task
+
+    run_stage("accuracy_page_per_module_loop", [accuracy_page_loop_task(p) for p in paths], args.concurrency, report)
+    run_stage("accuracy_page_breakdown", [accuracy_breakdown_task(p["path_id"]) for p in paths], args.concurrency,
+              report)
+    report["total_wall_seconds"] = round(time.perf_counter() - start, 3)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""技能树解析器基准：校验新解析器与原正则实现在黄金语料上输出一致，并对比大规模技能树的解析耗时
+
+用法：python bench/bench_parser.py [--modules 30 150 300] [--repeat 20] [--chunk-size 20]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from skill_tree_parser import SkillTreeParser, parse_learning_modules  # noqa: E402
+
+
+# 原backend/main.py中的正则实现，保留原样作为对照
+def legacy_parse_learning_modules(path_content):
+    """解析DeepSeek返回的Markdown格式分层级技能树，提取模块信息"""
+    modules = []
+    # 匹配层级和模块
+    level_pattern = re.compile(r'#\s*[🟢🟡🔴]?\s*(初级|中级|高级).*?\n(.*?)(?=#\s*[🟢🟡🔴]|$)', re.DOTALL)
+    level_matches = level_pattern.findall(path_content)
+
+    for level_match in level_matches:
+        level_name = level_match[0].strip()
+        level_content = level_match[1]
+
+        # 匹配该层级下的所有模块
+        module_pattern = re.compile(r'##\s*\d+\.\s*(.+?)\n(.*?)(?=##\s*\d+\.|$)', re.DOTALL)
+        module_matches = module_pattern.findall(level_content)
+
+        for module_match in module_matches:
+            module_name = module_match[0].strip()
+            module_details = module_match[1]
+
+            # 提取模块各项信息
+            duration_pattern = re.compile(r'预计学习时长：(\d+)小时')
+            duration = duration_pattern.search(module_details).group(1) if duration_pattern.search(
+                module_details) else "8"
+
+            dependency_pattern = re.compile(r'前置依赖：(.+)')
+            dependency = dependency_pattern.search(module_details).group(1).strip() if dependency_pattern.search(
+                module_details) else "无"
+
+            points_pattern = re.compile(r'核心技能点：(.+)')
+            points = points_pattern.search(module_details).group(1).strip() if points_pattern.search(
+                module_details) else ""
+
+            goal_pattern = re.compile(r'学习目标：(.+)')
+            goal = goal_pattern.search(module_details).group(1).strip() if goal_pattern.search(module_details) else ""
+
+            modules.append({
+                "name": module_name,
+                "duration": duration,
+                "dependency": dependency,
+                "points": points,
+                "level": level_name,
+                "goal": goal
+            })
+
+    return modules
+
+
+LEVELS = (("🟢", "初级", "基础入门"), ("🟡", "中级", "进阶核心"), ("🔴", "高级", "实战拔高"))
+
+
+def build_module(index, name, level, hours, dependency):
+    return (
+        f"## {index}. {name}\n"
+        f"- 预计学习时长：{hours}小时\n"
+        f"- 所属层级：{level}\n"
+        f"- 前置依赖：{dependency}\n"
+        f"- 核心技能点：{name}概念、{name}语法、{name}实践、常见问题\n"
+        f"- 学习目标：能够独立运用{name}完成{level}练习\n"
+    )
+
+
+def build_tree(modules_per_level, seed=0):
+    """生成与LLM输出格式一致的合成技能树"""
+    rng = random.Random(seed)
+    parts = []
+    for emoji, level, title in LEVELS:
+        parts.append(f"# {emoji} {level}（{title}）\n---\n")
+        for i in range(1, modules_per_level + 1):
+            dependency = "无" if level == "初级" and i == 1 else f"{level}模块{i - 1}"
+            parts.append(build_module(i, f"{level}模块{i}", level, rng.randint(4, 20), dependency))
+    return "".join(parts).strip()
+
+
+# 黄金语料：覆盖LLM输出中常见的格式变化
+GOLDEN_CORPUS = [
+    build_tree(2),
+    build_tree(3).replace("\n", "\r\n"),
+    # 开场白、结束语、空行和分隔线
+    "好的，以下是为你定制的技能树：\n\n" + build_tree(2).replace("\n## ", "\n\n---\n## ") + "\n\n祝学习顺利！",
+    # 缺失字段使用默认值
+    "# 🟢 初级（基础入门）\n## 1. Python基础\n- 所属层级：初级\n- 核心技能点：变量、循环\n"
+    "## 2. 数据结构\n- 预计学习时长：6小时\n- 前置依赖：Python基础\n"
+    "# 🟡 中级（进阶核心）\n## 1. Pandas\n- 学习目标：能够清洗数据",
+    # 层级用二级标题、模块用三级标题
+    "## 🟢 初级\n### 1. Linux命令\n- 预计学习时长：5小时\n- 前置依赖：无\n"
+    "## 🔴 高级\n### 1. Shell脚本\n- 预计学习时长：9小时\n- 前置依赖：Linux命令\n- 学习目标：编写自动化脚本\n",
+    # 层级之前的模块、无法识别层级名的emoji标题下的模块均被忽略
+    "## 1. 孤立模块\n- 预计学习时长：3小时\n"
+    "# 🟢 初级（基础入门）\n## 1. Git基础\n- 预计学习时长：4小时\n"
+    "# 🟡 附加内容\n## 1. 不属于任何层级\n- 预计学习时长：2小时\n"
+    "# 🔴 高级（实战拔高）\n## 1. Git工作流\n- 预计学习时长：7小时\n- 前置依赖：Git基础",
+    # 字段值带多余空白、重复字段取第一次出现
+    "# 🟢 初级\n## 1.   SQL入门  \n- 预计学习时长：10小时\n- 前置依赖：  无  \n"
+    "- 前置依赖：重复\n- 核心技能点：SELECT、JOIN \n- 学习目标：会写查询\n",
+]
+
+
+def chunked_parse(text, rng):
+    """按随机长度分块喂入，模拟流式输出"""
+    parser = SkillTreeParser()
+    modules = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 40)
+        modules.extend(parser.feed(text[position:position + size]))
+        position += size
+    return modules + parser.close()
+
+
+def legacy_stream_parse(text, chunk_size):
+    """原流式接口的做法：每收到一段增量就重新解析整个缓冲区"""
+    emitted = 0
+    for end in range(chunk_size, len(text) + chunk_size, chunk_size):
+        modules = legacy_parse_learning_modules(text[:end])
+        emitted = max(emitted, len(modules) - 1)
+    return emitted
+
+
+def incremental_stream_parse(text, chunk_size):
+    parser = SkillTreeParser()
+    emitted = 0
+    for start in range(0, len(text), chunk_size):
+        emitted += len(parser.feed(text[start:start + chunk_size]))
+    return emitted + len(parser.close())
+
+
+def verify_golden(corpus):
+    rng = random.Random(42)
+    for index, text in enumerate(corpus):
+        expected = legacy_parse_learning_modules(text)
+        actual = parse_learning_modules(text)
+        chunked = chunked_parse(text, rng)
+        if actual != expected or chunked != expected:
+            print(f"语料#{index}解析结果不一致")
+            print("expected:", json.dumps(expected, ensure_ascii=False, indent=2))
+            print("actual:  ", json.dumps(actual, ensure_ascii=False, indent=2))
+            print("chunked: ", json.dumps(chunked, ensure_ascii=False, indent=2))
+            return False
+    return True
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--modules", type=int, nargs="+", default=[30, 150, 300],
+                            help="合成技能树的模块总数（平均分到三个层级）")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--chunk-size", type=int, default=20, help="模拟流式输出时每段增量的字符数")
+    args = arg_parser.parse_args()
+
+    synthetic = [build_tree(max(1, total // 3), seed=total) for total in args.modules]
+    if not verify_golden(GOLDEN_CORPUS + synthetic):
+        sys.exit(1)
+    print(f"黄金语料校验通过：{len(GOLDEN_CORPUS)}份样例 + {len(synthetic)}份合成技能树（整体解析与分块解析）")
+
+    results = []
+    for total, text in zip(args.modules, synthetic):
+        legacy = min(timeit.repeat(lambda: legacy_parse_learning_modules(text), number=1, repeat=args.repeat))
+        current = min(timeit.repeat(lambda: parse_learning_modules(text), number=1, repeat=args.repeat))
+        stream_current = min(timeit.repeat(lambda: incremental_stream_parse(text, args.chunk_size),
+                                           number=1, repeat=args.repeat))
+        # 整体重解析是平方复杂度，只跑一次
+        stream_legacy = timeit.timeit(lambda: legacy_stream_parse(text, args.chunk_size), number=1)
+        results.append({
+            "modules": len(parse_learning_modules(text)),
+            "bytes": len(text.encode("utf-8")),
+            "full_text": {
+                "legacy_ms": round(legacy * 1000, 3),
+                "parser_ms": round(current * 1000, 3),
+                "speedup": round(legacy / current, 2)
+            },
+            "streaming": {
+                "chunks": -(-len(text) // args.chunk_size),
+                "legacy_reparse_ms": round(stream_legacy * 1000, 3),
+                "parser_ms": round(stream_current * 1000, 3),
+                "speedup": round(stream_legacy / stream_current, 2)
+            }
+        })
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""表结构迁移基准：在SQLite上造百万级答题数据，对比热点查询在迁移前（版本1）后（最新版本）的查询计划和耗时
+
+查询直接调用backend/repository.py中的方法，查询计划取自其实际执行的SQL（EXPLAIN QUERY PLAN），写操作执行后回滚。
+
+用法：python bench/bench_schema.py [--answers 2000000] [--catalog-size 500] [--repeat 50]
+                                   [--db /tmp/bench_schema.db] [--output report.json]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from migrations import latest_version  # noqa: E402
+from repository import SQLiteRepository  # noqa: E402
+
+MODULES_PER_PATH = 10
+EXERCISES_PER_MODULE = 4
+LEVELS = ("初级", "中级", "高级")
+
+
+class TracingCursor:
+    """记录执行过的SQL，其余属性透传给底层游标"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        if rows:
+            self.statements.append((sql, rows[0]))
+        return self._cursor.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def seed(repository, conn, answers, catalog_size, rng):
+    """写入合成数据：每条路径MODULES_PER_PATH个模块，每个模块EXERCISES_PER_MODULE道题全部作答"""
+    cursor = conn.cursor()
+    paths = max(1, answers // (MODULES_PER_PATH * EXERCISES_PER_MODULE))
+    names = [f"模块{i}" for i in range(catalog_size)]
+
+    repository.insert_many(cursor, "MODULE_CATALOG", ["catalog_key", "module_name", "level", "resource_type"],
+                           [[f"{name}|零基础|视频", name, "零基础", "视频"] for name in names])
+    cursor.execute("SELECT catalog_id, module_name FROM MODULE_CATALOG")
+    catalog_ids = {name: catalog_id for catalog_id, name in cursor.fetchall()}
+    repository.insert_resources(cursor, [
+        (catalog_id, {"title": f"{name}教程{i}", "url": f"https://example.com/{catalog_id}/{i}", "source": "B站",
+                      "tag": "适合零基础", "type": ("视频", "文档")[i % 2]})
+        for name, catalog_id in catalog_ids.items() for i in range(2)
+    ])
+    repository.insert_exercises(cursor, [
+        (catalog_id, {"question": f"{name}题目{i}", "answer": "A", "analysis": "", "difficulty": 1,
+                      "options": "A,B,C,D"})
+        for name, catalog_id in catalog_ids.items() for i in range(EXERCISES_PER_MODULE)
+    ])
+    cursor.execute("SELECT exercise_id, catalog_id FROM EXERCISE")
+    exercise_ids = {}
+    for exercise_id, catalog_id in cursor.fetchall():
+        exercise_ids.setdefault(catalog_id, []).append(exercise_id)
+
+    repository.insert_many(cursor, "LEARNING_PATH", ["target", "level", "pace", "resource_type", "path_content"],
+                           [[f"目标{i}", "零基础", "紧凑", "视频", ""] for i in range(paths)])
+    path_modules = [(path_id, rng.sample(names, MODULES_PER_PATH)) for path_id in range(1, paths + 1)]
+    repository.insert_many(cursor, "LEARNING_MODULE",
+                           ["path_id", "module_name", "estimated_hours", "dependency", "level", "catalog_id"], [
+                               [path_id, name, 8, "无", LEVELS[i * len(LEVELS) // MODULES_PER_PATH], catalog_ids[name]]
+                               for path_id, module_names in path_modules for i, name in enumerate(module_names)
+                           ])
+    repository.insert_many(cursor, "USER_PROGRESS", ["path_id", "module_name", "status", "accuracy"], [
+        [path_id, name, "学习中", 0.0] for path_id, module_names in path_modules for name in module_names
+    ])
+
+    answer_columns = ["path_id", "module_name", "exercise_id", "user_answer", "is_correct"]
+    batch = []
+    for path_id, module_names in path_modules:
+        for name in module_names:
+            for exercise_id in exercise_ids[catalog_ids[name]]:
+                correct = rng.random() < 0.7
+                batch.append([path_id, name, exercise_id, "A" if correct else "B", int(correct)])
+        if len(batch) >= 100000:
+            repository.insert_many(cursor, "USER_ANSWER", answer_columns, batch)
+            batch = []
+    repository.insert_many(cursor, "USER_ANSWER", answer_columns, batch)
+    conn.commit()
+    cursor.close()
+    return {"paths": paths, "modules": paths * MODULES_PER_PATH, "catalog_entries": catalog_size,
+            "answers": paths * MODULES_PER_PATH * EXERCISES_PER_MODULE}
+
+
+# 引入答题计数器（ANSWER_STATS）之前按USER_ANSWER实时聚合的正确率统计，保留作为对照
+def legacy_answer_stats(cursor, path_id, module_name=None):
+    query = '''
+    SELECT COUNT(is_correct), SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END)
+    FROM USER_ANSWER WHERE path_id = ?
+    '''
+    params = [path_id]
+    if module_name:
+        query += ' AND module_name = ?'
+        params.append(module_name)
+    cursor.execute(query, params)
+    return cursor.fetchone()
+
+
+def build_operations(repository, dataset, catalog_size, rng):
+    """热点访问路径，每个操作接收游标，参数每次随机选取"""
+    def random_path():
+        return rng.randint(1, dataset["paths"])
+
+    def path_module(cursor):
+        path_id = random_path()
+        cursor.execute("SELECT module_name FROM LEARNING_MODULE WHERE path_id = ? LIMIT 1", (path_id,))
+        return path_id, cursor.fetchone()[0]
+
+    def answer_row(cursor):
+        cursor.execute("SELECT path_id, module_name, exercise_id FROM USER_ANSWER WHERE answer_id = ?",
+                       (rng.randint(1, dataset["answers"]),))
+        return cursor.fetchone()
+
+    return {
+        "find_module": (None, lambda cursor, _: repository.find_module(cursor, f"模块{rng.randrange(catalog_size)}")),
+        "list_resources": (None, lambda cursor, _: repository.list_resources(
+            cursor, None, rng.randint(1, catalog_size), "视频")),
+        "list_exercises": (None, lambda cursor, _: repository.list_exercises(
+            cursor, None, rng.randint(1, catalog_size))),
+        "save_answer": (answer_row, lambda cursor, row: repository.save_answer(cursor, *row, "A", True)),
+        "save_progress": (path_module, lambda cursor, key: repository.save_progress(cursor, *key, "已完成", 75.0)),
+        "aggregate_answers_path": (None, lambda cursor, _: legacy_answer_stats(cursor, random_path())),
+        "aggregate_answers_module": (path_module, lambda cursor, key: legacy_answer_stats(cursor, *key)),
+        "answer_stats_path": (None, lambda cursor, _: repository.answer_stats(cursor, random_path())),
+        "answer_stats_module": (path_module, lambda cursor, key: repository.answer_stats(cursor, *key)),
+    }
+
+
+def query_plan(conn, sql, params):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[3] for row in rows]
+
+
+def measure(conn, operations, repeat):
+    results = {}
+    for name, (prepare, operation) in operations.items():
+        latencies = []
+        plans = []
+        try:
+            for i in range(repeat):
+                # 准备参数的查询不计入耗时，也不计入查询计划
+                args = prepare(conn.cursor()) if prepare else None
+                cursor = TracingCursor(conn.cursor())
+                start = time.perf_counter()
+                operation(cursor, args)
+                latencies.append(time.perf_counter() - start)
+                if i == 0:
+                    plans = [{"sql": " ".join(sql.split()), "plan": query_plan(conn, sql, params)}
+                             for sql, params in cursor.statements]
+                conn.rollback()
+        except sqlite3.Error as e:
+            # 依赖后续迁移（如upsert需要的唯一约束）的操作在旧版本表结构上无法执行
+            conn.rollback()
+            results[name] = {"error": str(e)}
+            print(f"  {name}: 无法执行（{e}）")
+            continue
+        latencies.sort()
+        results[name] = {
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p95_ms": round(latencies[max(0, -(-len(latencies) * 95 // 100) - 1)] * 1000, 3),
+            "statements": plans
+        }
+        print(f"  {name}: mean={results[name]['mean_ms']}ms p95={results[name]['p95_ms']}ms")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--answers", type=int, default=2000000, help="答题记录数")
+    arg_parser.add_argument("--catalog-size", type=int, default=500, help="不同模块名（模块目录条目）的个数")
+    arg_parser.add_argument("--repeat", type=int, default=50, help="每个操作执行的次数")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--db", help="SQLite文件路径（默认临时文件，结束后删除）")
+    arg_parser.add_argument("--output", help="报告另存为JSON文件")
+    args = arg_parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_schema.db")
+    if os.path.exists(db_path):
+        sys.exit(f"{db_path}已存在，请指定新的文件")
+    repository = SQLiteRepository(db_path, auto_migrate=False)
+    conn = repository.connect()
+    rng = random.Random(args.seed)
+    report = {"config": {k: v for k, v in vars(args).items() if k != "output"}}
+
+    try:
+        repository.migrate(conn, target_version=1)
+        start = time.perf_counter()
+        report["dataset"] = seed(repository, conn, args.answers, args.catalog_size, rng)
+        report["dataset"]["seed_seconds"] = round(time.perf_counter() - start, 2)
+        print(f"数据准备完成：{report['dataset']}")
+        operations = build_operations(repository, report["dataset"], args.catalog_size, rng)
+
+        print("迁移前（版本1）：")
+        report["before"] = measure(conn, operations, args.repeat)
+
+        start = time.perf_counter()
+        executed = repository.migrate(conn)
+        report["migration"] = {"versions": executed, "seconds": round(time.perf_counter() - start, 2)}
+        print(f"执行迁移{executed}（版本{latest_version()}），耗时{report['migration']['seconds']}秒")
+
+        print("迁移后：")
+        report["after"] = measure(conn, operations, args.repeat)
+        report["speedup"] = {name: round(report["before"][name]["mean_ms"] / max(result["mean_ms"], 0.001), 1)
+                             for name, result in report["after"].items()
+                             if "mean_ms" in result and "mean_ms" in report["before"][name]}
+    finally:
+        conn.close()
+        if not args.db:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
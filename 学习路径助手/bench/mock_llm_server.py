@@ -0,0 +1,130 @@
+"""OpenAI兼容的本地模拟LLM服务：无需DeepSeek密钥即可驱动后端完整流程做压测
+
+回放录制的响应或生成格式合法的合成技能树/学习资源/练习题，支持配置延迟、抖动和错误率，
+支持stream=true的SSE流式响应。后端配置API_BASE_URL=http://127.0.0.1:8010/v1 即可接入。
+
+用法：python bench/mock_llm_server.py [--port 8010] [--latency-ms 800] [--jitter-ms 200]
+                                      [--error-rate 0.01] [--recordings recordings.json]
+recordings.json格式：{"path": ["技能树Markdown", ...], "resources": ["JSON文本", ...], "exercises": [...]}
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from llm_provider import MockLLMProvider  # noqa: E402
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    provider = None
+    error_status = 500
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"未知路径：{self.path}", "type": "invalid_request_error"}})
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        model = body.get("model", self.provider.model)
+
+        time.sleep(self.provider.sample_latency())
+        if self.provider.should_fail():
+            self._send_json(self.error_status, {"error": {"message": "模拟LLM调用失败", "type": "server_error"}})
+            return
+
+        content = self.provider.respond(prompt)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        usage = self.provider.usage(prompt, content)
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self._send_stream(completion_id, model, content, usage if include_usage else None)
+            return
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, completion_id, model, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        size = self.provider.chunk_size
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": content[i:i + size]} for i in range(0, len(content), size)]
+        for index, delta in enumerate(deltas):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta,
+                             "finish_reason": "stop" if index == len(deltas) - 1 else None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        if usage:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8010)
+    arg_parser.add_argument("--latency-ms", type=float, default=800, help="每次调用的平均延迟（毫秒）")
+    arg_parser.add_argument("--jitter-ms", type=float, default=200, help="延迟在±jitter范围内均匀抖动")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误响应的比例（0~1）")
+    arg_parser.add_argument("--error-status", type=int, default=500, help="错误响应的HTTP状态码，如500/429")
+    arg_parser.add_argument("--recordings", help="录制响应的JSON文件")
+    arg_parser.add_argument("--seed", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    recordings = None
+    if args.recordings:
+        with open(args.recordings, encoding="utf-8") as f:
+            recordings = json.load(f)
+    MockLLMHandler.provider = MockLLMProvider(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                              error_rate=args.error_rate, recordings=recordings, seed=args.seed)
+    MockLLMHandler.error_status = args.error_status
+
+    server = ThreadingHTTPServer((args.host, args.port), MockLLMHandler)
+    server.daemon_threads = True
+    print(f"模拟LLM服务已启动：http://{args.host}:{args.port}/v1 "
+          f"（延迟{args.latency_ms}±{args.jitter_ms}ms，错误率{args.error_rate}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
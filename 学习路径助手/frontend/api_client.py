@@ -0,0 +1,98 @@
+import os
+
+import requests
+import streamlit as st
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+# 模块资源和练习题生成后不再变化，缓存时间与后端Cache-Control一致；正确率在提交答题后主动清除
+CONTENT_CACHE_TTL = int(os.getenv("FRONTEND_CONTENT_CACHE_TTL", "300"))
+ACCURACY_CACHE_TTL = int(os.getenv("FRONTEND_ACCURACY_CACHE_TTL", "60"))
+HTTP_POOL_SIZE = int(os.getenv("FRONTEND_HTTP_POOL_SIZE", "10"))
+
+
+class EmptyContent(Exception):
+    """模块暂无资源或练习题。以异常返回，st.cache_data不会缓存，下次重跑重新查询（懒加载模式下可能已生成）"""
+
+
+@st.cache_resource
+def get_session():
+    """所有会话共用的HTTP会话，连接保持长连接复用"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get_data(path, params, timeout):
+    response = get_session().get(f"{BACKEND_URL}{path}", params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+@st.cache_data(ttl=CONTENT_CACHE_TTL, show_spinner=False)
+def _load_resources(module_name):
+    # 懒加载模式下首次查询会现场生成资源
+    data = _get_data("/api/get-resources", {"module_name": module_name}, timeout=120)
+    if not data:
+        raise EmptyContent(module_name)
+    return data
+
+
+@st.cache_data(ttl=CONTENT_CACHE_TTL, show_spinner=False)
+def _load_exercises(module_name):
+    # 懒加载模式下首次查询会现场生成练习题
+    data = _get_data("/api/get-exercises", {"module_name": module_name}, timeout=120)
+    if not data:
+        raise EmptyContent(module_name)
+    return data
+
+
+def get_resources(module_name):
+    try:
+        return _load_resources(module_name)
+    except EmptyContent:
+        return []
+
+
+def get_exercises(module_name):
+    try:
+        return _load_exercises(module_name)
+    except EmptyContent:
+        return []
+
+
+@st.cache_data(ttl=CONTENT_CACHE_TTL, show_spinner=False)
+def get_path(path_id):
+    """学习路径及解析后的模块列表（路径生成后不再变化）"""
+    return _get_data(f"/api/path/{path_id}", None, timeout=10)
+
+
+@st.cache_data(ttl=ACCURACY_CACHE_TTL, show_spinner=False)
+def get_accuracy_breakdown(path_id):
+    """总体、各层级和各模块的正确率"""
+    response = get_session().post(f"{BACKEND_URL}/api/get-accuracy-breakdown", json={"path_id": path_id},
+                                  timeout=10)
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+def submit_answers(path_id, module_name, answers):
+    """整张答题卡一次提交，返回本模块最新正确率；提交后正确率缓存失效"""
+    response = get_session().post(
+        f"{BACKEND_URL}/api/submit-answers",
+        json={"path_id": path_id, "module_name": module_name, "answers": answers},
+        timeout=30
+    )
+    response.raise_for_status()
+    get_accuracy_breakdown.clear()
+    return response.json()["data"]
+
+
+def stream_generate_path(payload):
+    """流式生成路径，返回未读取的响应，调用方用with关闭"""
+    return get_session().post(f"{BACKEND_URL}/api/generate-path/stream", json=payload, stream=True,
+                              timeout=(10, 120))
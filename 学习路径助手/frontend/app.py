@@ -1,13 +1,9 @@
 import streamlit as st
 import requests
-import os
-from dotenv import load_dotenv
-import pyodbc
-import pandas as pd
+import json
 
-# 加载环境变量
-load_dotenv()
-BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+# 后端访问（含环境变量加载）集中在api_client，前端不直接访问数据库
+import api_client
 
 # 页面配置
 st.set_page_config(
@@ -103,6 +99,71 @@ div[data-testid="stVerticalBlock"] > div[style*="border: 1px solid rgb(221, 221,
 </style>
 """, unsafe_allow_html=True)
 
+def iter_sse_events(response):
+    """逐条解析后端返回的Server-Sent Events，产出(event, data)"""
+    response.encoding = "utf-8"
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+        elif not line and data_lines:
+            yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+
+
+def group_by_level(modules):
+    """按层级分组模块，保持生成顺序"""
+    level_groups = {}
+    for module in modules:
+        level_groups.setdefault(module["level"], []).append(module)
+    return level_groups
+
+
+# 可视化页的层级：(层级, 标题, 标签样式, 是否默认展开)
+LEVEL_SECTIONS = (
+    ("初级", "🟢 初级（基础入门）", "level-primary", True),
+    ("中级", "🟡 中级（进阶核心）", "level-intermediate", False),
+    ("高级", "🔴 高级（实战拔高）", "level-advanced", False),
+)
+# 每个层级每页渲染的模块数，技能树再大页面元素数也有上限
+MODULES_PER_PAGE = 10
+SUMMARY_COLUMNS = {
+    "module_name": "模块名称",
+    "level": "所属层级",
+    "estimated_hours": "预计时长(小时)",
+    "dependency": "前置依赖",
+    "goal": "学习目标"
+}
+
+
+def render_level(level, title, tag_class, modules, expanded):
+    """渲染一个层级的模块卡片，模块数超过MODULES_PER_PAGE时分页，只渲染当前页"""
+    st.markdown(f"### {title}")
+    pages = -(-len(modules) // MODULES_PER_PAGE)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"{level}共{len(modules)}个模块，页码（1-{pages}）", min_value=1, max_value=pages,
+                               step=1, key=f"viz_page_{st.session_state.path_id}_{level}")
+    with st.container(border=True):
+        for module in modules[(page - 1) * MODULES_PER_PAGE:page * MODULES_PER_PAGE]:
+            with st.expander(f"{module['module_name']}（{module['estimated_hours']} 小时）", expanded=expanded):
+                # 每个模块一次渲染：标题、时长、依赖、技能点（按顿号换行）和学习目标
+                skill_points = module['points'].replace('、', '、<br>')
+                st.markdown(f"""
+                <h5><span class='level-tag {tag_class}'>{level}</span> {module['module_name']}</h5>
+                <p><strong>预计学习时长</strong>：{module['estimated_hours']} 小时</p>
+                <p><strong>前置依赖</strong>：{module['dependency']}</p>
+                <div class='skill-points'><strong>核心技能点</strong>：{skill_points}</div>
+                <p><strong>学习目标</strong>：{module['goal']}</p>
+                """, unsafe_allow_html=True)
+            if st.button(f"开始学习 {module['module_name']}", key=f"start_{module['module_id']}"):
+                st.session_state.current_tab = "学习资源与练习"
+                st.session_state.selected_module = module["module_name"]
+                st.rerun()
+
+
 # 初始化会话状态（移除所有进度相关字段）
 if "path_id" not in st.session_state:
     st.session_state.path_id = None
@@ -151,37 +212,57 @@ if st.session_state.current_tab == "学习需求":
         submit_btn = st.form_submit_button("生成分层级技能", type="primary")
 
     if submit_btn and target:
-        with st.spinner("🎯 正在生成分层级技能（包含初级→中级→高级），请耐心等待...（预计需要3-5分钟）"):
+        with st.spinner("🎯 正在生成分层级技能（包含初级→中级→高级），模块会陆续显示..."):
             try:
-                response = requests.post(
-                    f"{BACKEND_URL}/api/generate-path",
-                    json={
-                        "target": target,
-                        "level": level,
-                        "pace": pace,
-                        "resource_type": resource_type
-                    },
-                    timeout=300
-                )
-                response.raise_for_status()
-                result = response.json()
-
-                st.session_state.path_id = result["data"]["path_id"]
-                st.session_state.modules = result["data"]["modules"]
-
-                level_groups = {}
-                for module in result["data"]["modules"]:
-                    if module["level"] not in level_groups:
-                        level_groups[module["level"]] = []
-                    level_groups[module["level"]].append(module)
-                st.session_state.level_groups = level_groups
-
-                if result["data"]["modules"]:
-                    st.session_state.selected_module = result["data"]["modules"][0]["module_name"]
+                progress_bar = st.progress(0.0, text="正在生成技能树...")
+                module_box = st.container(border=True)
+                streamed_modules = []
+                finished_parts = 0
+                result_data = None
+
+                # 流式接口：模块一生成完就推送，随后推送其资源和练习题
+                with api_client.stream_generate_path({
+                    "target": target,
+                    "level": level,
+                    "pace": pace,
+                    "resource_type": resource_type
+                }) as response:
+                    response.raise_for_status()
+                    for event, data in iter_sse_events(response):
+                        if event == "module":
+                            streamed_modules.append(data)
+                            module_box.write(f"✅ 【{data['level']}】{data['name']}（{data['duration']} 小时）")
+                        elif event in ("resources", "exercises"):
+                            finished_parts += 1
+                        elif event == "done":
+                            result_data = data
+                        elif event == "error":
+                            raise Exception(data["detail"])
+
+                        total_parts = len(streamed_modules) * 2
+                        if result_data:
+                            # 懒加载模式下不推送资源和练习题，收到done即完成
+                            progress_bar.progress(1.0, text=f"已生成{len(streamed_modules)}个模块")
+                        elif total_parts:
+                            progress_bar.progress(
+                                finished_parts / total_parts,
+                                text=f"已生成{len(streamed_modules)}个模块，资源与练习题完成 {finished_parts}/{total_parts}"
+                            )
+
+                if not result_data:
+                    raise Exception("生成中断，未收到完整结果")
+
+                st.session_state.path_id = result_data["path_id"]
+                st.session_state.modules = result_data["modules"]
+
+                st.session_state.level_groups = group_by_level(result_data["modules"])
+
+                if result_data["modules"]:
+                    st.session_state.selected_module = result_data["modules"][0]["module_name"]
 
                 st.success("✅ 分层级技能生成成功！请切换到「可视化」查看详情")
             except requests.exceptions.Timeout:
-                st.error("⚠️ 请求超时！后端可能仍在生成，请等待1分钟后刷新页面。")
+                st.error("⚠️ 请求超时！请检查后端服务状态后重试。")
             except requests.exceptions.ConnectionError:
                 st.error("❌ 连接失败！请检查后端服务是否启动。")
             except Exception as e:
@@ -194,123 +275,21 @@ elif st.session_state.current_tab == "可视化":
     st.header("🌳 分层级技能可视化")
     if st.session_state.path_id:
         try:
-            conn = pyodbc.connect(
-                f"DRIVER={os.getenv('SQL_SERVER_DRIVER')};"
-                f"SERVER={os.getenv('SQL_SERVER_SERVER')};"
-                f"DATABASE={os.getenv('SQL_SERVER_DATABASE')};"
-                f"Trusted_Connection=yes;"
-            )
-            cursor = conn.cursor()
-            cursor.execute('SELECT path_content FROM LEARNING_PATH WHERE path_id = ?', (st.session_state.path_id,))
-            path_content = cursor.fetchone()[0]
-            cursor.close()
-            conn.close()
+            # 路径及解析后的模块从后端读取（带缓存），刷新会话状态中的模块列表
+            path = api_client.get_path(st.session_state.path_id)
+            st.session_state.modules = path["modules"]
+            st.session_state.level_groups = group_by_level(path["modules"])
 
             st.subheader("🎯 你的个性化分层级技能")
+            for level, title, tag_class, expanded in LEVEL_SECTIONS:
+                if level in st.session_state.level_groups:
+                    render_level(level, title, tag_class, st.session_state.level_groups[level], expanded)
 
-            # 初级模块（移除进度相关内容）
-            if "初级" in st.session_state.level_groups:
-                st.markdown("### 🟢 初级（基础入门）")
-                with st.container(border=True):
-                    for module in st.session_state.level_groups["初级"]:
-                        expander_title = f"<span class='level-tag level-primary'>初级</span> {module['module_name']}"
-                        with st.expander("", expanded=True):
-                            col_content = st.columns([5])[0]  # 移除进度列，只保留内容列
-                            with col_content:
-                                st.markdown(f"<h5>{expander_title}</h5>", unsafe_allow_html=True)
-                                # 带内边距的容器，文字不贴边
-                                with st.container(border=True):
-                                    st.write(f"**预计学习时长**：{module['estimated_hours']} 小时")
-                                with st.container(border=True):
-                                    st.write(f"**前置依赖**：{module['dependency']}")
-                                with st.container(border=True):
-                                    # 核心优化：用HTML容器强制换行，长文本自动折行
-                                    skill_points = module['points'].replace('、', '、<br>')  # 技能点换行
-                                    st.markdown(f"<div class='skill-points'>**核心技能点**：{skill_points}</div>",
-                                                unsafe_allow_html=True)
-                                with st.container(border=True):
-                                    st.write(f"**学习目标**：{module['goal']}")
-                            # 移除进度相关内容，保留学习按钮（仅切换标签）
-                            if st.button(f"开始学习 {module['module_name']}", key=f"start_{module['module_id']}"):
-                                st.session_state.current_tab = "学习资源与练习"
-                                st.session_state.selected_module = module["module_name"]
-                                st.rerun()
-
-            # 中级模块（移除进度相关内容）
-            if "中级" in st.session_state.level_groups:
-                st.markdown("### 🟡 中级（进阶核心）")
-                with st.container(border=True):
-                    for module in st.session_state.level_groups["中级"]:
-                        expander_title = f"<span class='level-tag level-intermediate'>中级</span> {module['module_name']}"
-                        with st.expander("", expanded=False):
-                            col_content = st.columns([5])[0]
-                            with col_content:
-                                st.markdown(f"<h5>{expander_title}</h5>", unsafe_allow_html=True)
-                                with st.container(border=True):
-                                    st.write(f"**预计学习时长**：{module['estimated_hours']} 小时")
-                                with st.container(border=True):
-                                    st.write(f"**前置依赖**：{module['dependency']}")
-                                with st.container(border=True):
-                                    skill_points = module['points'].replace('、', '、<br>')
-                                    st.markdown(f"<div class='skill-points'>**核心技能点**：{skill_points}</div>",
-                                                unsafe_allow_html=True)
-                                with st.container(border=True):
-                                    st.write(f"**学习目标**：{module['goal']}")
-                            if st.button(f"开始学习 {module['module_name']}", key=f"start_{module['module_id']}"):
-                                st.session_state.current_tab = "学习资源与练习"
-                                st.session_state.selected_module = module["module_name"]
-                                st.rerun()
-
-            # 高级模块（移除进度相关内容）
-            if "高级" in st.session_state.level_groups:
-                st.markdown("### 🔴 高级（实战拔高）")
-                with st.container(border=True):
-                    for module in st.session_state.level_groups["高级"]:
-                        expander_title = f"<span class='level-tag level-advanced'>高级</span> {module['module_name']}"
-                        with st.expander("", expanded=False):
-                            col_content = st.columns([5])[0]
-                            with col_content:
-                                st.markdown(f"<h5>{expander_title}</h5>", unsafe_allow_html=True)
-                                with st.container(border=True):
-                                    st.write(f"**预计学习时长**：{module['estimated_hours']} 小时")
-                                with st.container(border=True):
-                                    st.write(f"**前置依赖**：{module['dependency']}")
-                                with st.container(border=True):
-                                    skill_points = module['points'].replace('、', '、<br>')
-                                    st.markdown(f"<div class='skill-points'>**核心技能点**：{skill_points}</div>",
-                                                unsafe_allow_html=True)
-                                with st.container(border=True):
-                                    st.write(f"**学习目标**：{module['goal']}")
-                            if st.button(f"开始学习 {module['module_name']}", key=f"start_{module['module_id']}"):
-                                st.session_state.current_tab = "学习资源与练习"
-                                st.session_state.selected_module = module["module_name"]
-                                st.rerun()
-
-            # 技能总览表格（移除进度列）
+            # 技能总览表格由后端随路径一起生成并缓存，前端不再逐行构造和着色
             st.subheader("📋 技能总览")
-            module_data = []
-            for module in st.session_state.modules:
-                module_data.append({
-                    "模块名称": module["module_name"],
-                    "所属层级": module["level"],
-                    "预计时长(小时)": module["estimated_hours"],
-                    "前置依赖": module["dependency"],
-                    "学习目标": module["goal"][:30] + "..." if len(module["goal"]) > 30 else module["goal"]
-                })
-
-            df = pd.DataFrame(module_data)
-
-            def color_level(val):
-                if val == "初级":
-                    return 'background-color: #d4edda; color: #155724'
-                elif val == "中级":
-                    return 'background-color: #fff3cd; color: #856404'
-                elif val == "高级":
-                    return 'background-color: #f8d7da; color: #721c24'
-                return ''
-
             st.dataframe(
-                df.style.applymap(color_level, subset=["所属层级"]),
+                path["summary"],
+                column_config=SUMMARY_COLUMNS,
                 use_container_width=True,
                 hide_index=True
             )
@@ -370,136 +349,117 @@ elif st.session_state.current_tab == "学习资源与练习":
             # 学习资源标签
             with tab1:
                 try:
-                    res_response = requests.get(
-                        f"{BACKEND_URL}/api/get-resources",
-                        params={"module_name": selected_module},
-                        timeout=30
-                    )
-                    if res_response.status_code == 200:
-                        st.session_state.resources = res_response.json()["data"]
-                        st.subheader("推荐学习资源")
-                        if st.session_state.resources:
-                            for idx, res in enumerate(st.session_state.resources):
-                                with st.expander("", expanded=True):
-                                    st.markdown(f"<h5>📌 {res['title']}</h5>", unsafe_allow_html=True)
-                                    col1, col2 = st.columns([3, 1])
-                                    with col1:
-                                        st.write(f"**来源平台**：{res['source']}")
-                                        st.write(f"**资源类型**：{res['type']}")
-                                        st.write(f"**适配标签**：{res['tag']}")
-                                        st.markdown(f"[🔗 点击访问资源]({res['url']})")
-                                    with col2:
-                                        if res['type'] == "视频":
-                                            st.markdown(
-                                                '<div style="background-color: #e8f4fd; padding: 1rem; border-radius: 8px; text-align: center;">📹 视频资源</div>',
-                                                unsafe_allow_html=True)
-                                        else:
-                                            st.markdown(
-                                                '<div style="background-color: #f0f8fb; padding: 1rem; border-radius: 8px; text-align: center;">📄 文档资源</div>',
-                                                unsafe_allow_html=True)
-                                st.divider()
-                        else:
-                            st.info("该模块暂无推荐资源～")
+                    # 重跑时（如每次点选答案）直接取缓存，不再请求后端
+                    st.session_state.resources = api_client.get_resources(selected_module)
+                    st.subheader("推荐学习资源")
+                    if st.session_state.resources:
+                        for idx, res in enumerate(st.session_state.resources):
+                            with st.expander("", expanded=True):
+                                st.markdown(f"<h5>📌 {res['title']}</h5>", unsafe_allow_html=True)
+                                col1, col2 = st.columns([3, 1])
+                                with col1:
+                                    st.write(f"**来源平台**：{res['source']}")
+                                    st.write(f"**资源类型**：{res['type']}")
+                                    st.write(f"**适配标签**：{res['tag']}")
+                                    st.markdown(f"[🔗 点击访问资源]({res['url']})")
+                                with col2:
+                                    if res['type'] == "视频":
+                                        st.markdown(
+                                            '<div style="background-color: #e8f4fd; padding: 1rem; border-radius: 8px; text-align: center;">📹 视频资源</div>',
+                                            unsafe_allow_html=True)
+                                    else:
+                                        st.markdown(
+                                            '<div style="background-color: #f0f8fb; padding: 1rem; border-radius: 8px; text-align: center;">📄 文档资源</div>',
+                                            unsafe_allow_html=True)
+                            st.divider()
+                    else:
+                        st.info("该模块暂无推荐资源～")
                 except Exception as e:
                     st.warning(f"获取资源失败：{str(e)}")
 
             # 练习题标签（移除进度更新逻辑，仅保留答题和正确率统计）
             with tab2:
                 try:
-                    ex_response = requests.get(
-                        f"{BACKEND_URL}/api/get-exercises",
-                        params={"module_name": selected_module},
-                        timeout=30
-                    )
-                    if ex_response.status_code == 200:
-                        st.session_state.exercises = ex_response.json()["data"]
-                        st.subheader("练习题（3单选+1问答）")
-
-                        if st.session_state.exercises:
-                            # 提交答题按钮
-                            col_submit, col_reset = st.columns([8, 2])
-                            with col_submit:
-                                submit_answers_btn = st.button("📤 提交所有答案", type="primary")
-                            with col_reset:
-                                if st.button("🔄 重置答案"):
-                                    st.session_state.user_answers = {}
-                                    st.rerun()
-
-                            # 遍历展示题目
-                            for idx, ex in enumerate(st.session_state.exercises):
-                                st.markdown(f"""
-                                <div class="metric-card">
-                                    <h5>题目{idx + 1}：{ex['question'].split('选项：')[0]}</h5>
-                                </div>
-                                """, unsafe_allow_html=True)
+                    st.session_state.exercises = api_client.get_exercises(selected_module)
+                    st.subheader("练习题（3单选+1问答）")
+
+                    if st.session_state.exercises:
+                        # 提交答题按钮
+                        col_submit, col_reset = st.columns([8, 2])
+                        with col_submit:
+                            submit_answers_btn = st.button("📤 提交所有答案", type="primary")
+                        with col_reset:
+                            if st.button("🔄 重置答案"):
+                                st.session_state.user_answers = {}
+                                st.rerun()
 
-                                # 区分单选题和问答题
+                        # 遍历展示题目
+                        for idx, ex in enumerate(st.session_state.exercises):
+                            st.markdown(f"""
+                            <div class="metric-card">
+                                <h5>题目{idx + 1}：{ex['question'].split('选项：')[0]}</h5>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                            # 区分单选题和问答题
+                            if ex.get('options'):
+                                options = ex['options']
+                                key = f"q_{ex['exercise_id']}"
+                                if key not in st.session_state.user_answers:
+                                    st.session_state.user_answers[key] = None
+                                selected_option = st.radio(
+                                    "请选择答案：",
+                                    options,
+                                    key=key,
+                                    index=None if st.session_state.user_answers[key] is None else options.index(
+                                        st.session_state.user_answers[key])
+                                )
+                                if selected_option is not None:
+                                    st.session_state.user_answers[key] = selected_option
+                                with st.expander("📖 查看答案与解析"):
+                                    st.write(f"**正确答案**：{ex['answer']}")
+                                    st.write(f"**解析**：{ex['analysis']}")
+                            else:
+                                key = f"q_{ex['exercise_id']}"
+                                if key not in st.session_state.user_answers:
+                                    st.session_state.user_answers[key] = ""
+                                user_answer = st.text_area(
+                                    "请输入答案：",
+                                    value=st.session_state.user_answers[key],
+                                    key=key,
+                                    height=100
+                                )
+                                st.session_state.user_answers[key] = user_answer
+                                with st.expander("📖 查看答案与解析"):
+                                    st.write(f"**参考答案**：{ex['answer']}")
+                                    st.write(f"**解析**：{ex['analysis']}")
+
+                            st.divider()
+
+                        # 提交答案逻辑（仅保留答题记录提交和正确率计算，移除进度更新）
+                        if submit_answers_btn:
+                            answers = []
+                            for ex in st.session_state.exercises:
+                                key = f"q_{ex['exercise_id']}"
+                                user_answer = st.session_state.user_answers.get(key) or ""
                                 if ex.get('options'):
-                                    options = ex['options']
-                                    key = f"q_{ex['exercise_id']}"
-                                    if key not in st.session_state.user_answers:
-                                        st.session_state.user_answers[key] = None
-                                    selected_option = st.radio(
-                                        "请选择答案：",
-                                        options,
-                                        key=key,
-                                        index=None if st.session_state.user_answers[key] is None else options.index(
-                                            st.session_state.user_answers[key])
-                                    )
-                                    if selected_option is not None:
-                                        st.session_state.user_answers[key] = selected_option
-                                    with st.expander("📖 查看答案与解析"):
-                                        st.write(f"**正确答案**：{ex['answer']}")
-                                        st.write(f"**解析**：{ex['analysis']}")
+                                    is_correct = (user_answer == ex['answer'])
                                 else:
-                                    key = f"q_{ex['exercise_id']}"
-                                    if key not in st.session_state.user_answers:
-                                        st.session_state.user_answers[key] = ""
-                                    user_answer = st.text_area(
-                                        "请输入答案：",
-                                        value=st.session_state.user_answers[key],
-                                        key=key,
-                                        height=100
-                                    )
-                                    st.session_state.user_answers[key] = user_answer
-                                    with st.expander("📖 查看答案与解析"):
-                                        st.write(f"**参考答案**：{ex['answer']}")
-                                        st.write(f"**解析**：{ex['analysis']}")
-
-                                st.divider()
-
-                            # 提交答案逻辑（仅保留答题记录提交和正确率计算，移除进度更新）
-                            if submit_answers_btn:
-                                correct_count = 0
-                                total_count = len(st.session_state.exercises)
-                                for ex in st.session_state.exercises:
-                                    key = f"q_{ex['exercise_id']}"
-                                    user_answer = st.session_state.user_answers.get(key, "")
-                                    is_correct = False
-                                    if ex.get('options'):
-                                        is_correct = (user_answer == ex['answer'])
-                                    else:
-                                        is_correct = ex['answer'].lower() in user_answer.lower()
-                                    # 提交答题记录
-                                    try:
-                                        requests.post(
-                                            f"{BACKEND_URL}/api/submit-answer",
-                                            json={
-                                                "path_id": st.session_state.path_id,
-                                                "module_name": selected_module,
-                                                "exercise_id": ex['exercise_id'],
-                                                "user_answer": user_answer,
-                                                "is_correct": is_correct
-                                            },
-                                            timeout=10
-                                        )
-                                    except Exception as e:
-                                        st.warning(f"提交题目{ex['exercise_id']}答案失败：{str(e)}")
-                                    if is_correct:
-                                        correct_count += 1
-
-                                # 计算正确率（移除进度更新）
-                                module_accuracy = (correct_count / total_count) * 100 if total_count > 0 else 0.0
+                                    is_correct = ex['answer'].lower() in user_answer.lower()
+                                answers.append({
+                                    "exercise_id": ex['exercise_id'],
+                                    "user_answer": user_answer,
+                                    "is_correct": is_correct
+                                })
+
+                            # 整张答题卡一次提交，后端在一个事务内写入并返回本模块最新正确率
+                            try:
+                                # 提交后正确率缓存随之失效，统计页重新查询
+                                result = api_client.submit_answers(st.session_state.path_id, selected_module, answers)
+                            except Exception as e:
+                                st.warning(f"提交答案失败：{str(e)}")
+                            else:
+                                module_accuracy = result["accuracy"]
                                 st.session_state.module_accuracy = module_accuracy
 
                                 # 美化展示（仅显示正确率，移除进度）
@@ -507,7 +467,7 @@ elif st.session_state.current_tab == "学习资源与练习":
                                 <div class="metric-card">
                                     <h3>✅ 答案提交成功！</h3>
                                     <p>本模块正确率：<strong>{module_accuracy:.2f}%</strong></p>
-                                    <p>答对：{correct_count} / 总题数：{total_count}</p>
+                                    <p>答对：{result['correct']} / 总题数：{result['total']}</p>
                                 </div>
                                 """, unsafe_allow_html=True)
                                 st.progress(module_accuracy / 100, text=f"正确率：{module_accuracy:.1f}%")
@@ -530,25 +490,18 @@ elif st.session_state.current_tab == "学习进度统计":
             )
 
         try:
-            # 调用后端接口获取正确率（移除进度相关字段）
+            # 一次请求取回总体、各层级和各模块的正确率，切换下拉框查看其他模块时取缓存
+            breakdown = api_client.get_accuracy_breakdown(st.session_state.path_id)
+            module_stats = {m["module_name"]: m for m in breakdown["modules"]}
+            empty_stats = {"total": 0, "correct": 0, "accuracy": 0.0}
+
             if selected_module == "总体":
-                response = requests.post(
-                    f"{BACKEND_URL}/api/get-accuracy",
-                    json={"path_id": st.session_state.path_id},
-                    timeout=10
-                )
-                response.raise_for_status()
+                data = breakdown["overall"]
                 st.subheader("📈 总体学习正确率")
             else:
-                response = requests.post(
-                    f"{BACKEND_URL}/api/get-accuracy",
-                    json={"path_id": st.session_state.path_id, "module_name": selected_module},
-                    timeout=10
-                )
-                response.raise_for_status()
+                data = module_stats.get(selected_module, empty_stats)
                 st.subheader(f"📈 {selected_module} - 模块正确率")
 
-            data = response.json()["data"]
             # 美化展示（仅保留正确率，移除进度）
             st.markdown(f"""
             <div class="metric-card">
@@ -570,33 +523,15 @@ elif st.session_state.current_tab == "学习进度统计":
                         col_idx = 0
                         for module in st.session_state.level_groups[level_name]:
                             with cols[col_idx]:
-                                try:
-                                    module_response = requests.post(
-                                        f"{BACKEND_URL}/api/get-accuracy",
-                                        json={"path_id": st.session_state.path_id,
-                                              "module_name": module['module_name']},
-                                        timeout=10
-                                    )
-                                    module_response.raise_for_status()
-                                    module_data = module_response.json()["data"]
-                                    st.markdown(f"""
-                                    <div class="metric-card">
-                                        <h5>{module['module_name']}</h5>
-                                        <p>正确率：{module_data['accuracy']}%</p>
-                                        <p>答对：{module_data['correct']} / 总题数：{module_data['total']}</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    st.progress(module_data['accuracy'] / 100, text=f"{module_data['accuracy']:.1f}%")
-                                except:
-                                    # 接口调用失败时显示默认数据
-                                    st.markdown(f"""
-                                    <div class="metric-card">
-                                        <h5>{module['module_name']}</h5>
-                                        <p>正确率：0%</p>
-                                        <p>答对：0 / 总题数：0</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    st.progress(0)
+                                module_data = module_stats.get(module['module_name'], empty_stats)
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h5>{module['module_name']}</h5>
+                                    <p>正确率：{module_data['accuracy']}%</p>
+                                    <p>答对：{module_data['correct']} / 总题数：{module_data['total']}</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                                st.progress(module_data['accuracy'] / 100, text=f"{module_data['accuracy']:.1f}%")
                             col_idx = 1 - col_idx
         except Exception as e:
             # 接口调用失败时显示友好提示
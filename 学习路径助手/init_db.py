@@ -1,132 +1,62 @@
-import pyodbc
+import argparse
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from repository import create_repository  # noqa: E402
+
 # 加载环境变量
 load_dotenv()
 
+# 数据库类型由DB_BACKEND决定：sqlserver（默认）或sqlite
+repository = create_repository()
+
 
-def get_sql_server_connection():
-    """获取SQL Server数据库连接（Windows身份验证）"""
+def get_connection():
+    """获取数据库连接（SQL Server使用Windows身份验证，SQLite使用WAL模式）"""
     try:
-        conn = pyodbc.connect(
-            f"DRIVER={os.getenv('SQL_SERVER_DRIVER')};"
-            f"SERVER={os.getenv('SQL_SERVER_SERVER')};"
-            f"DATABASE={os.getenv('SQL_SERVER_DATABASE')};"
-            f"Trusted_Connection=yes;"  # Windows身份验证的关键配置
-        )
-        return conn
+        return repository.connect()
     except Exception as e:
         print(f"数据库连接失败：{str(e)}")
         raise
 
 
 def init_database():
-    """初始化SQL Server数据表"""
-    conn = get_sql_server_connection()
-    cursor = conn.cursor()
-
-    # 1. 学习路径表
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LEARNING_PATH')
-    CREATE TABLE LEARNING_PATH (
-        path_id INT IDENTITY(1,1) PRIMARY KEY,
-        target VARCHAR(255) NOT NULL,
-        level VARCHAR(50) NOT NULL,
-        pace VARCHAR(50) NOT NULL,
-        resource_type VARCHAR(50) NOT NULL,
-        create_time DATETIME DEFAULT GETDATE(),
-        path_content VARCHAR(MAX)
-    )
-    ''')
-
-    # 2. 学习模块表
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LEARNING_MODULE')
-    CREATE TABLE LEARNING_MODULE (
-        module_id INT IDENTITY(1,1) PRIMARY KEY,
-        path_id INT,
-        module_name VARCHAR(100) NOT NULL,
-        estimated_hours INT,
-        dependency VARCHAR(100),
-        FOREIGN KEY (path_id) REFERENCES LEARNING_PATH (path_id)
-    )
-    ''')
-
-    # 3. 学习资源表
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LEARNING_RESOURCE')
-    CREATE TABLE LEARNING_RESOURCE (
-        resource_id INT IDENTITY(1,1) PRIMARY KEY,
-        module_id INT,
-        title VARCHAR(255) NOT NULL,
-        url VARCHAR(512) NOT NULL,
-        source VARCHAR(50),
-        tag VARCHAR(50),
-        type VARCHAR(20),
-        FOREIGN KEY (module_id) REFERENCES LEARNING_MODULE (module_id)
-    )
-    ''')
-
-    # 4. 练习题表
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'EXERCISE')
-    CREATE TABLE EXERCISE (
-        exercise_id INT IDENTITY(1,1) PRIMARY KEY,
-        module_id INT,
-        question VARCHAR(MAX) NOT NULL,
-        answer VARCHAR(MAX) NOT NULL,
-        analysis VARCHAR(MAX),
-        difficulty INT DEFAULT 1,
-        FOREIGN KEY (module_id) REFERENCES LEARNING_MODULE (module_id)
-    )
-    ''')
-
-    # 5. 学习进度表
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'USER_PROGRESS')
-    CREATE TABLE USER_PROGRESS (
-        progress_id INT IDENTITY(1,1) PRIMARY KEY,
-        path_id INT,
-        module_name VARCHAR(100) NOT NULL,
-        status VARCHAR(20) DEFAULT '未开始',
-        accuracy FLOAT DEFAULT 0.0,
-        update_time DATETIME DEFAULT GETDATE(),
-        FOREIGN KEY (path_id) REFERENCES LEARNING_PATH (path_id)
-    )
-    ''')
-
-    conn.commit()
-    cursor.close()
+    """执行未执行过的表结构迁移（建表、补字段、建索引）"""
+    conn = get_connection()
+    executed = repository.migrate(conn)
     conn.close()
-    print("数据库表初始化成功！")
+    if executed:
+        print(f"数据库表结构已升级，本次执行迁移版本：{executed}")
+    else:
+        print("数据库表结构已是最新版本")
 
 
 def init_static_resources():
     """初始化静态学习资源和练习题（演示用）"""
-    conn = get_sql_server_connection()
+    conn = get_connection()
     cursor = conn.cursor()
 
     # 修复核心：先插入一条测试用的学习路径（生成有效的path_id）
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM LEARNING_PATH WHERE target = '测试路径')
-    INSERT INTO LEARNING_PATH (target, level, pace, resource_type, path_content)
-    VALUES ('测试路径', '零基础', '紧凑', '视频', '测试用学习路径')
-    ''')
-    # 获取这条测试路径的path_id（后续模块关联这个有效id）
-    cursor.execute('SELECT path_id FROM LEARNING_PATH WHERE target = \'测试路径\'')
-    test_path_id = cursor.fetchone()[0]
-
-    # 插入测试模块（关联有效的path_id，不再用0）
-    cursor.execute('''
-    IF NOT EXISTS (SELECT * FROM LEARNING_MODULE WHERE module_name = 'HTML基础')
-    INSERT INTO LEARNING_MODULE (path_id, module_name, estimated_hours, dependency)
-    VALUES (?, ?, ?, ?)
-    ''', (test_path_id, 'HTML基础', 8, '无'))
-
-    # 获取HTML基础模块的module_id（避免硬编码1）
-    cursor.execute('SELECT module_id FROM LEARNING_MODULE WHERE module_name = \'HTML基础\'')
-    module_id = cursor.fetchone()[0]
+    cursor.execute('SELECT path_id FROM LEARNING_PATH WHERE target = ?', ('测试路径',))
+    row = cursor.fetchone()
+    if row:
+        test_path_id = row[0]
+    else:
+        test_path_id = repository.insert_path(cursor, '测试路径', '零基础', '紧凑', '视频', '测试用学习路径')
+
+    # 插入测试模块（关联有效的path_id，不再用0），已存在时说明静态资源已初始化过
+    cursor.execute('SELECT module_id FROM LEARNING_MODULE WHERE module_name = ?', ('HTML基础',))
+    if cursor.fetchone():
+        cursor.close()
+        conn.close()
+        print("静态资源已存在，跳过初始化")
+        return
+    module_id = repository.insert_row(cursor, 'LEARNING_MODULE', 'module_id', {
+        "path_id": test_path_id, "module_name": 'HTML基础', "estimated_hours": 8, "dependency": '无'
+    })
 
     # 插入HTML基础模块的资源（用实际的module_id）
     static_resources = [
@@ -157,6 +87,80 @@ def init_static_resources():
     print("静态资源初始化成功！")
 
 
+def verify_answer_stats():
+    """对照USER_ANSWER检查答题计数器，返回不一致的行数"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    mismatches = repository.verify_answer_stats(cursor)
+    cursor.close()
+    conn.close()
+    for path_id, module_name, total, correct, stats_total, stats_correct in mismatches[:20]:
+        print(f"path_id={path_id} {module_name}：实际{correct}/{total}，计数器{stats_correct}/{stats_total}")
+    print(f"答题计数器校验完成：{len(mismatches)}行不一致")
+    return len(mismatches)
+
+
+def check_answer_writes():
+    """在回滚的事务中按插入、对错翻转、原样重复提交、取消判分和跨批次批量提交依次写答题记录，
+    每步之后对照USER_ANSWER检查该路径的答题计数器，返回不一致的步骤数（不留下任何数据）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    module_name = '计数器自检'
+    steps = [
+        ("首次提交", [(1, "A", True), (2, "B", False), (3, "C", None)]),
+        ("对错翻转", [(1, "B", False), (2, "A", True)]),
+        ("原样重复提交", [(1, "B", False), (2, "A", True)]),
+        ("取消判分", [(2, "", None), (3, "C", True)]),
+        ("单题提交", [(4, "D", True)]),
+        # 超过一批的行数上限（SQL Server按参数个数分批），跨批次混合插入和更新
+        ("跨批次提交", [(exercise_id, "A", exercise_id % 3 == 0) for exercise_id in range(1, 601)]),
+    ]
+    failures = 0
+    try:
+        path_id = repository.insert_path(cursor, module_name, '零基础', '紧凑', '视频', '答题计数器自检')
+        for name, answers in steps:
+            if len(answers) == 1:
+                repository.save_answer(cursor, path_id, module_name, *answers[0])
+            else:
+                repository.save_answers(cursor, path_id, module_name, answers)
+            mismatches = [row for row in repository.verify_answer_stats(cursor) if row[0] == path_id]
+            total, correct = repository.answer_stats(cursor, path_id, module_name)
+            print(f"{name}：计数器{correct}/{total}，{'不一致' if mismatches else '一致'}")
+            failures += bool(mismatches)
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+    print(f"答题写入自检完成：{failures}步不一致")
+    return failures
+
+
+def rebuild_answer_stats():
+    """按USER_ANSWER重建全部答题计数器"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    rows = repository.rebuild_answer_stats(cursor)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    print(f"答题计数器重建完成：{rows}行")
+
+
 if __name__ == "__main__":
-    init_database()
-    init_static_resources()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="执行表结构迁移并写入演示数据，或维护答题计数器")
+    arg_parser.add_argument("--verify-answer-stats", action="store_true",
+                            help="只校验答题计数器与USER_ANSWER是否一致，不一致时退出码为1")
+    arg_parser.add_argument("--rebuild-answer-stats", action="store_true", help="按USER_ANSWER重建答题计数器")
+    arg_parser.add_argument("--check-answer-writes", action="store_true",
+                            help="在回滚的事务中写一组答题记录并逐步校验答题计数器，不一致时退出码为1")
+    args = arg_parser.parse_args()
+
+    if args.verify_answer_stats:
+        sys.exit(1 if verify_answer_stats() else 0)
+    elif args.rebuild_answer_stats:
+        rebuild_answer_stats()
+    elif args.check_answer_writes:
+        sys.exit(1 if check_answer_writes() else 0)
+    else:
+        init_database()
+        init_static_resources()
\ No newline at end of file